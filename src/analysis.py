@@ -7,7 +7,7 @@ from mpi4py import MPI
 import numpy as np
 from petsc4py import PETSc
 from dolfinx import fem, io
-from dolfinx.fem.petsc import LinearProblem
+from dolfinx.fem.petsc import LinearProblem, assemble_matrix, assemble_vector, apply_lifting, set_bc, create_vector
 from dolfinx.io import gmshio
 from rich.console import Console
 import ufl
@@ -15,6 +15,8 @@ import csv
 import json
 import re
 import os
+import time
+import resource
 
 comm = MPI.COMM_WORLD
 mesh_file = sys.argv[1] if len(sys.argv) > 1 else "square_with_circle.msh"
@@ -23,6 +25,11 @@ input_json_path = sys.argv[3] if len(sys.argv) > 3 else "input.json"
 create_files = sys.argv[4] if len(sys.argv) > 4 else "0"
 console = Console(force_terminal=True)
 
+# Analysis inputs from the JSON config of this cycle
+input_json_file = open(input_json_path, "r")
+input_fields = json.load(input_json_file)
+input_json_file.close()
+
 # ----------------------------------------------------------------------
 # Read mesh & tags from the .msh file generated in Gmsh
 # ----------------------------------------------------------------------
@@ -48,11 +55,13 @@ with io.XDMFFile(comm, mesh_file, "r") as xdmf:
 # ----------------------------------------------------------------------
 # Function space and material properties
 # ----------------------------------------------------------------------
-V = fem.functionspace(mesh, ("CG", 1, (mesh.geometry.dim,)))
+element_order = input_fields.get("element_order", 1)
+V = fem.functionspace(mesh, ("CG", element_order, (mesh.geometry.dim,)))
 
-# Isotropic data 
-E_LPSCl, nu_LPSCl = 7.8e9, 0.33      # inclusion
-E_Si,    nu_Si    = 1.65e11, 0.3    # matrix
+# Isotropic data, config "materials" overrides the defaults
+materials = input_fields.get("materials", {})
+E_LPSCl, nu_LPSCl = materials.get("inclusion", (7.8e9, 0.33))      # inclusion
+E_Si,    nu_Si    = materials.get("matrix", (1.65e11, 0.3))    # matrix
 
 def lame(E, nu):
     mu = E / (2.0 * (1.0 + nu))
@@ -114,13 +123,27 @@ problem = fem.petsc.LinearProblem(
     a, L, bcs=bcs,
     petsc_options={"ksp_type": "cg", "pc_type": "gamg", "ksp_rtol": 1e-8}
 )
+solve_start = time.perf_counter()
 uh = problem.solve()
+solve_time = time.perf_counter() - solve_start
 uh.name = "displacement"
 
-if create_files == "1":
+# Output goes either to per-record XDMF files or, in archive mode, to fields.npz which the
+# driver folds into the study archive next to the mesh it already holds
+archive_mode = input_fields.get("output_mode", "records") == "archive"
+
+# XDMF (and the archive) store point data on the mesh nodes, so P2 on straight triangles
+# is written through the space that matches the geometry
+u_nodes = uh
+if create_files == "1" and element_order != mesh.geometry.cmap.degree:
+    V_nodes = fem.functionspace(mesh, ("CG", mesh.geometry.cmap.degree, (mesh.geometry.dim,)))
+    u_nodes = fem.Function(V_nodes, name="displacement")
+    u_nodes.interpolate(uh)
+
+if create_files == "1" and not archive_mode:
     with io.XDMFFile(comm, "displacement.xdmf", "w") as out:
         out.write_mesh(mesh)
-        out.write_function(uh)
+        out.write_function(u_nodes)
 
 # ----------------------------------------------------------------------
 # Compute and save stress
@@ -145,23 +168,179 @@ vms = proj_problem.solve()
 vms.name = "vonMises"
 
 # Write results to XDMF
-if create_files == "1":
+if create_files == "1" and not archive_mode:
     with io.XDMFFile(comm, "vonMises.xdmf", "w") as out:
         out.write_mesh(mesh)
         out.write_function(vms)
 
+# Fields in the node and cell order of the mesh file, the archive keeps only that copy
+if create_files == "1" and archive_mode:
+    num_cells = mesh.topology.index_map(mesh.topology.dim).size_local
+    bs = u_nodes.function_space.dofmap.index_map_bs
+    node_values = np.zeros((mesh.geometry.x.shape[0], bs))
+    node_values[mesh.geometry.dofmap.ravel()] = u_nodes.x.array.reshape(-1, bs)[u_nodes.function_space.dofmap.list.ravel()]
+    displacement_file = np.empty_like(node_values)
+    displacement_file[mesh.geometry.input_global_indices] = node_values
+    vms_file = np.empty(num_cells)
+    vms_file[mesh.topology.original_cell_index] = vms.x.array[:num_cells]
+    np.savez(os.path.join(os.path.dirname(mesh_file), "fields.npz"), displacement=displacement_file, vonMises=vms_file)
+
 # Print max von Mises
 vms_arr = vms.x.array
 max_vms = np.max(vms_arr)
 mean_vms = np.mean(vms_arr)
 
+# The cell average hides the peak at the interface once the stress varies inside a cell
+# (P2 and up), so the peak is also taken from von Mises interpolated into DG(k-1)
+if element_order > 1:
+    DG_vms = fem.functionspace(mesh, ("DG", element_order - 1))
+    vms_pointwise = fem.Function(DG_vms)
+    vms_pointwise.interpolate(fem.Expression(vms_expr, DG_vms.element.interpolation_points()))
+    max_vms_pointwise = float(np.max(vms_pointwise.x.array))
+else:
+    max_vms_pointwise = float(max_vms)
+
 if comm.rank == 0:
     console.log(f"[green]Max von Mises stress: {max_vms/1e6:.3f} MPa[/green]")
 
-# Save results to CSV, read potential analysis inputs from JSON
-input_json_file = open(input_json_path, "r")
-input_fields = json.load(input_json_file)
+# ----------------------------------------------------------------------
+# Homogenized moduli from several load cases on the same mesh
+# ----------------------------------------------------------------------
+# Each case prescribes an affine displacement u = E x on the whole boundary. The boundary
+# dofs are the same for every case, so the stiffness matrix and the GAMG setup are built
+# once and only the lifted right-hand side changes between solves.
+moduli = None
+if input_fields.get("multi_load", False):
+    load_params = input_fields["multi_load_params"]
+    strain = load_params.get("strain", 1.0e-3)
+    macro_strains = {
+        "uniaxial_x": np.array([[1.0, 0.0], [0.0, 0.0]]),
+        "uniaxial_y": np.array([[0.0, 0.0], [0.0, 1.0]]),
+        "shear":      np.array([[0.0, 0.5], [0.5, 0.0]]), # engineering shear strain = strain
+        "biaxial":    np.array([[1.0, 0.0], [0.0, 1.0]]),
+    }
+
+    boundary_facets = facet_tags.indices[np.isin(facet_tags.values, [1, 2, 3, 4])]
+    boundary_dofs = fem.locate_dofs_topological(V, mesh.topology.dim - 1, boundary_facets)
+    u_bc = fem.Function(V)
+    bc_affine = fem.dirichletbc(u_bc, boundary_dofs)
+
+    a_form = fem.form(a)
+    L_zero = fem.form(ufl.inner(fem.Constant(mesh, PETSc.ScalarType((0.0, 0.0))), v) * dx)
+
+    A = assemble_matrix(a_form, bcs=[bc_affine])
+    A.assemble()
+    ksp = PETSc.KSP().create(comm)
+    ksp.setOperators(A)
+    ksp.setType("cg")
+    ksp.getPC().setType("gamg")
+    ksp.setTolerances(rtol=1e-8)
+
+    b = create_vector(L_zero)
+    u_case = fem.Function(V)
+    S_case = sigma(u_case, lam, mu)
+    area = comm.allreduce(fem.assemble_scalar(fem.form(fem.Constant(mesh, PETSc.ScalarType(1.0)) * dx)), op=MPI.SUM)
+    avg_forms = [[fem.form(S_case[i, j] * dx) for j in range(2)] for i in range(2)]
+
+    avg_stress = {}
+    for case in load_params.get("cases", list(macro_strains.keys())):
+        E_macro = strain * macro_strains[case]
+        u_bc.interpolate(lambda x: np.vstack((E_macro[0, 0] * x[0] + E_macro[0, 1] * x[1],
+                                              E_macro[1, 0] * x[0] + E_macro[1, 1] * x[1])))
+        with b.localForm() as b_local:
+            b_local.set(0)
+        assemble_vector(b, L_zero)
+        apply_lifting(b, [a_form], bcs=[[bc_affine]])
+        b.ghostUpdate(addv=PETSc.InsertMode.ADD, mode=PETSc.ScatterMode.REVERSE)
+        set_bc(b, [bc_affine])
+        ksp.solve(b, u_case.x.petsc_vec)
+        u_case.x.scatter_forward()
 
+        avg_stress[case] = np.array([[comm.allreduce(fem.assemble_scalar(avg_forms[i][j]), op=MPI.SUM) / area
+                                      for j in range(2)] for i in range(2)])
+        if comm.rank == 0:
+            console.log(f"[green]Load case {case}: mean stress {avg_stress[case].flatten()/1e6} MPa[/green]")
+
+    # Plane strain stiffness in Voigt form [xx, yy, xy] with engineering shear
+    moduli = {}
+    if all(case in avg_stress for case in ("uniaxial_x", "uniaxial_y", "shear")):
+        columns = [avg_stress[case] / strain for case in ("uniaxial_x", "uniaxial_y", "shear")]
+        C = np.array([[c[0, 0], c[1, 1], c[0, 1]] for c in columns]).T
+        S_voigt = np.linalg.inv(C)
+        moduli.update({
+            "C11": C[0, 0], "C22": C[1, 1], "C12": 0.5 * (C[0, 1] + C[1, 0]), "C33": C[2, 2],
+            "E_x": 1.0 / S_voigt[0, 0], "E_y": 1.0 / S_voigt[1, 1],
+            "nu_xy": -S_voigt[0, 1] / S_voigt[0, 0], "G_xy": 1.0 / S_voigt[2, 2]
+        })
+    if "biaxial" in avg_stress:
+        moduli["k_biaxial"] = 0.5 * np.trace(avg_stress["biaxial"]) / (2.0 * strain)
+
+# ----------------------------------------------------------------------
+# Material sweep on the same mesh
+# ----------------------------------------------------------------------
+# Only the DG0 lam/mu arrays change between sweep points. The bilinear form is compiled
+# once, the matrix is reassembled into its existing sparsity pattern, and the load vector
+# (independent of the moduli, zero Dirichlet values) is assembled a single time.
+sweep_rows = []
+if input_fields.get("material_sweep", False):
+    sweep_params = input_fields["material_sweep_params"]
+    inclusion_set = sweep_params.get("inclusion", [[E_LPSCl, nu_LPSCl]])
+    matrix_set = sweep_params.get("matrix", [[E_Si, nu_Si]])
+
+    a_sweep = fem.form(a)
+    L_sweep = fem.form(L)
+    A_sweep = assemble_matrix(a_sweep, bcs=bcs)
+    A_sweep.assemble()
+    b_sweep = assemble_vector(L_sweep)
+    apply_lifting(b_sweep, [a_sweep], bcs=[bcs])
+    b_sweep.ghostUpdate(addv=PETSc.InsertMode.ADD, mode=PETSc.ScatterMode.REVERSE)
+    set_bc(b_sweep, bcs)
+
+    ksp_sweep = PETSc.KSP().create(comm)
+    ksp_sweep.setOperators(A_sweep)
+    ksp_sweep.setType("cg")
+    ksp_sweep.getPC().setType("gamg")
+    ksp_sweep.setTolerances(rtol=1e-8)
+
+    # DG0 projection is a cell average: integrate over each cell, divide by its area
+    u_sweep = fem.Function(V)
+    S_sweep = sigma(u_sweep, lam, mu)
+    dev_sweep = S_sweep - (1.0/3.0)*ufl.tr(S_sweep)*I
+    vms_sweep_form = fem.form(ufl.inner(ufl.sqrt(3.0/2.0 * ufl.inner(dev_sweep, dev_sweep)), v_vms)*dx)
+    cell_areas = fem.assemble_vector(fem.form(ufl.inner(fem.Constant(mesh, PETSc.ScalarType(1.0)), v_vms)*dx)).array
+
+    for E_inc, nu_inc in inclusion_set:
+        for E_mat, nu_mat in matrix_set:
+            lam_inc, mu_inc = lame(E_inc, nu_inc)
+            lam_mat, mu_mat = lame(E_mat, nu_mat)
+            lam.x.array[cell_values == 1] = lam_inc
+            lam.x.array[cell_values == 2] = lam_mat
+            mu.x.array[cell_values == 1] = mu_inc
+            mu.x.array[cell_values == 2] = mu_mat
+            lam.x.scatter_forward()
+            mu.x.scatter_forward()
+
+            A_sweep.zeroEntries()
+            assemble_matrix(A_sweep, a_sweep, bcs=bcs)
+            A_sweep.assemble()
+            ksp_sweep.setOperators(A_sweep)
+            ksp_sweep.solve(b_sweep, u_sweep.x.petsc_vec)
+            u_sweep.x.scatter_forward()
+
+            vms_cells = fem.assemble_vector(vms_sweep_form).array / cell_areas
+            sweep_rows.append([E_inc, nu_inc, E_mat, nu_mat, float(np.max(vms_cells)), float(np.mean(vms_cells))])
+            if comm.rank == 0:
+                console.log(f"[green]E_inc {E_inc:.3e}, E_mat {E_mat:.3e}: max von Mises {np.max(vms_cells)/1e6:.3f} MPa[/green]")
+
+    # Back to the base phases
+    lam.x.array[cell_values == 1] = lam1
+    lam.x.array[cell_values == 2] = lam2
+    mu.x.array[cell_values == 1] = mu1
+    mu.x.array[cell_values == 2] = mu2
+    lam.x.scatter_forward()
+    mu.x.scatter_forward()
+
+# Save results to CSV
 mesh_info = open(os.path.join(os.path.dirname(mesh_file), "meshinfo.json"), "r")
 mesh_info_data = json.load(mesh_info)
 
@@ -174,4 +353,49 @@ csv_file = open(results_path + "/data.csv", "a", newline="")
 writer = csv.writer(csv_file)
 writer.writerow([int(mesh_id), circles, max_vms, mean_vms, af, size])
 csv_file.close()
-input_json_file.close()
\ No newline at end of file
+
+sweep_columns = ["E_inclusion", "nu_inclusion", "E_matrix", "nu_matrix", "vms_max", "vms_mean"]
+if sweep_rows:
+    sweep_name = os.path.join(results_path, "material_sweep.csv")
+    new_file = not os.path.exists(sweep_name)
+    sweep_file = open(sweep_name, "a", newline="")
+    writer = csv.writer(sweep_file)
+    if new_file:
+        writer.writerow(["id"] + sweep_columns)
+    for sweep_row in sweep_rows:
+        writer.writerow([int(mesh_id)] + sweep_row)
+    sweep_file.close()
+
+moduli_columns = ["C11", "C22", "C12", "C33", "E_x", "E_y", "nu_xy", "G_xy", "k_biaxial"]
+moduli_row = None
+if moduli:
+    moduli_row = {c: float(moduli[c]) if c in moduli else "" for c in moduli_columns}
+    moduli_name = os.path.join(results_path, "moduli.csv")
+    new_file = not os.path.exists(moduli_name)
+    moduli_file = open(moduli_name, "a", newline="")
+    writer = csv.writer(moduli_file)
+    if new_file:
+        writer.writerow(["id"] + moduli_columns)
+    writer.writerow([int(mesh_id)] + list(moduli_row.values()))
+    moduli_file.close()
+
+# Per-cycle copy of the row so the driver can pick it up without re-reading data.csv
+result_data = {
+    "id": int(mesh_id),
+    "circles": circles,
+    "vms_max": float(max_vms),
+    "vms_max_pointwise": max_vms_pointwise,
+    "vms_mean": float(mean_vms),
+    "area_fraction": af,
+    "size": size,
+    "element_order": element_order,
+    "dofs": V.dofmap.index_map.size_global * V.dofmap.index_map_bs,
+    "solve_time": solve_time,
+    "peak_memory_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+}
+# Under the MPI driver results_path is the record directory, rank 0 appends these from here
+if moduli_row:
+    result_data["moduli"] = moduli_row
+if sweep_rows:
+    result_data["material_sweep"] = [dict(zip(sweep_columns, sweep_row)) for sweep_row in sweep_rows]
+json.dump(result_data, open(os.path.join(os.path.dirname(mesh_file), "result.json"), "w"))
\ No newline at end of file
@@ -0,0 +1,105 @@
+import xml.etree.ElementTree as ET
+import numpy as np
+import h5py
+import json
+import os
+
+# One HDF5 file per study instead of a records/<i>/ directory per cycle. Every cycle is a
+# group /cycles/<id> holding the mesh once (geometry, topology, cell and facet tags), the
+# optional fields written by analysis.py in the same node/cell order, the packing when one
+# was saved, and meshinfo.json + result.json as attributes.
+
+def cycle_key(cycle_id):
+    return f"cycles/{int(cycle_id):06d}"
+
+def read_xdmf_items(xdmf_path):
+    # Grid name -> {"topology": path, "geometry": path, "values": path} inside the .h5
+    items = {}
+    root = ET.parse(xdmf_path).getroot()
+    for grid in root.iter("Grid"):
+        name = grid.get("Name")
+        entry = {}
+        for child, key in (("Topology", "topology"), ("Geometry", "geometry"), ("Attribute", "values")):
+            node = grid.find(child)
+            if node is not None and node.find("DataItem") is not None:
+                entry[key] = node.find("DataItem").text.strip()
+        if entry:
+            items[name] = entry
+    return items
+
+def read_h5_item(record_dir, item):
+    h5_name, dataset = item.split(":", 1)
+    with h5py.File(os.path.join(record_dir, h5_name), "r") as f:
+        return f[dataset][()]
+
+def read_record(record_dir, cycle_id):
+    record_dir = str(record_dir)
+    items = read_xdmf_items(os.path.join(record_dir, f"mesh{cycle_id}.xdmf"))
+
+    payload = {"arrays": {}, "attrs": {}}
+    arrays = payload["arrays"]
+    mesh_item = next(entry for entry in items.values() if "geometry" in entry)
+    arrays["geometry"] = read_h5_item(record_dir, mesh_item["geometry"])
+    arrays["topology"] = read_h5_item(record_dir, mesh_item["topology"])
+    for tags in ("cell_tags", "facet_tags"):
+        if tags in items:
+            arrays[f"{tags}/topology"] = read_h5_item(record_dir, items[tags]["topology"])
+            arrays[f"{tags}/values"] = read_h5_item(record_dir, items[tags]["values"])
+
+    fields_path = os.path.join(record_dir, "fields.npz")
+    if os.path.exists(fields_path):
+        fields = np.load(fields_path)
+        for name in fields.files:
+            arrays[f"fields/{name}"] = fields[name]
+
+    packing_path = os.path.join(record_dir, f"packing{cycle_id}.npz")
+    if os.path.exists(packing_path):
+        packing = np.load(packing_path)
+        for name in packing.files:
+            arrays[f"packing/{name}"] = packing[name]
+
+    for name in ("meshinfo.json", "result.json"):
+        path = os.path.join(record_dir, name)
+        if os.path.exists(path):
+            payload["attrs"].update(json.load(open(path, "r")))
+    return payload
+
+class StudyArchive:
+    def __init__(self, path, mode="a", compression_level=4):
+        self.path = path
+        self.compression_level = compression_level
+        self.file = h5py.File(path, mode)
+
+    def write_cycle(self, cycle_id, payload):
+        key = cycle_key(cycle_id)
+        if key in self.file:
+            del self.file[key]
+        group = self.file.create_group(key)
+        for name, data in payload["arrays"].items():
+            data = np.asarray(data)
+            if data.size == 0:
+                group.create_dataset(name, data=data)
+            else:
+                group.create_dataset(name, data=data, chunks=True, shuffle=True,
+                                     compression="gzip", compression_opts=self.compression_level)
+        for name, value in payload["attrs"].items():
+            if isinstance(value, dict) or (isinstance(value, list) and any(isinstance(v, dict) for v in value)):
+                # HDF5 attributes take no nested records, keep them as JSON text
+                value = json.dumps(value)
+            group.attrs[name] = value
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+def list_cycles(path):
+    with h5py.File(path, "r") as f:
+        return sorted(int(k) for k in f["cycles"].keys()) if "cycles" in f else []
+
+def load_cycle(path, cycle_id):
+    arrays = {}
+    with h5py.File(path, "r") as f:
+        group = f[cycle_key(cycle_id)]
+        group.visititems(lambda name, obj: arrays.__setitem__(name, obj[()]) if isinstance(obj, h5py.Dataset) else None)
+        attrs = dict(group.attrs)
+    return {"arrays": arrays, "attrs": attrs}
@@ -0,0 +1,101 @@
+#!/usr/bin/python3
+"""
+Meshing setting autotuner. Run with:
+    python3 src/autotune.py
+A few packings are drawn from config.json and each is meshed with every combination of
+the candidate 2D algorithms and smoothing passes in autotune_params. Meshing time, element
+count and the worst element quality (minSICN) go to results/autotune.csv. The fastest
+setting whose worst quality over all samples stays above min_quality is written to
+results/autotune.json, where the generators pick it up when mesh_algorithm/mesh_smoothing
+are "auto".
+"""
+import itertools
+import time
+import csv
+import json
+import os
+import numpy as np
+import gmsh
+import main
+
+ALGORITHM_NAMES = {1: "MeshAdapt", 2: "Automatic", 3: "Initial mesh only", 5: "Delaunay",
+                   6: "Frontal-Delaunay", 7: "BAMG", 9: "Packing of Parallelograms"}
+
+def mesh_sample(generator, algorithm, smoothing):
+    gmsh.initialize()
+    gmsh.model.add("Autotune")
+    gmsh.option.setNumber("General.Terminal", 0)
+    gmsh.option.setNumber("Mesh.CharacteristicLengthMax", generator.mesh_element_size)
+    gmsh.option.setNumber("Mesh.Algorithm", algorithm)
+    gmsh.option.setNumber("Mesh.Smoothing", smoothing)
+    if generator.geometry_order > 1:
+        gmsh.option.setNumber("Mesh.ElementOrder", generator.geometry_order)
+    generator.build_geometry()
+
+    start = time.perf_counter()
+    gmsh.model.mesh.generate(2)
+    elapsed = time.perf_counter() - start
+
+    _, element_tags, _ = gmsh.model.mesh.getElements(2)
+    tags = np.concatenate(element_tags) if element_tags else np.zeros(0)
+    quality = float(np.min(gmsh.model.mesh.getElementQualities(tags, "minSICN"))) if len(tags) else 0.0
+    gmsh.finalize()
+    return elapsed, len(tags), quality
+
+def autotune():
+    params = main.fields["autotune_params"]
+    settings = list(itertools.product(params["algorithms"], params["smoothing"]))
+
+    generators = []
+    for k in range(params["samples"]):
+        generator = main.build_generator(main.fields)
+        generator.generate_packing()
+        generators.append(generator)
+    main.console.log(f"[green]Meshing {len(generators)} packings with {len(settings)} settings[/green]")
+
+    results = {}
+    with open(os.path.join(main.results_path, "autotune.csv"), "w", newline="") as tune_file:
+        writer = csv.writer(tune_file)
+        writer.writerow(['sample', 'algorithm', 'smoothing', 'mesh_time', 'elements', 'min_quality', 'status'])
+        for (algorithm, smoothing), (k, generator) in itertools.product(settings, enumerate(generators)):
+            try:
+                elapsed, elements, quality = mesh_sample(generator, algorithm, smoothing)
+                status = "ok"
+            except Exception as e:
+                # A setting that crashes on one of our geometries is as bad as a slow one
+                gmsh.finalize()
+                main.console.log(f"[red]Algorithm {algorithm}, smoothing {smoothing} failed on sample {k}: {e}[/red]")
+                elapsed, elements, quality, status = float("nan"), 0, 0.0, "failed"
+            writer.writerow([k, algorithm, smoothing, elapsed, elements, quality, status])
+            results.setdefault((algorithm, smoothing), []).append((elapsed, elements, quality, status))
+
+    summary = []
+    for (algorithm, smoothing), runs in results.items():
+        ok = all(status == "ok" for *_, status in runs)
+        mean_time = float(np.mean([r[0] for r in runs])) if ok else float("inf")
+        worst_quality = min(r[2] for r in runs)
+        summary.append((algorithm, smoothing, mean_time, float(np.mean([r[1] for r in runs])), worst_quality))
+        main.console.log(f"[cyan]{ALGORITHM_NAMES.get(algorithm, algorithm)} ({algorithm}), smoothing {smoothing}: "
+                         f"{mean_time:.3f}s, {np.mean([r[1] for r in runs]):.0f} elements, min quality {worst_quality:.3f}[/cyan]")
+
+    eligible = [s for s in summary if s[4] >= params["min_quality"] and np.isfinite(s[2])]
+    if not eligible:
+        main.console.log(f"[red]No setting reached min_quality {params['min_quality']}, keeping the generator defaults[/red]")
+        return
+    algorithm, smoothing, mean_time, elements, quality = min(eligible, key=lambda s: s[2])
+    tuned = {
+        "mesh_algorithm": algorithm,
+        "mesh_smoothing": smoothing,
+        "mesh_time": mean_time,
+        "elements": elements,
+        "min_quality": quality,
+        "mesh_element_size": main.fields["mesh_element_size"],
+        "layout": main.fields["layout"],
+        "samples": params["samples"]
+    }
+    json.dump(tuned, open(os.path.join(main.results_path, "autotune.json"), "w"), indent=4)
+    main.console.log(f"[green]Selected {ALGORITHM_NAMES.get(algorithm, algorithm)} ({algorithm}) with smoothing {smoothing}: "
+                     f"{mean_time:.3f}s per mesh, min quality {quality:.3f}[/green]")
+
+if __name__ == "__main__":
+    autotune()
@@ -0,0 +1,80 @@
+#!/usr/bin/python3
+"""
+Accuracy-per-DOF benchmark for the displacement element order. Run with:
+    python3 src/benchmark.py
+Every case in benchmark_params is meshed from the same packing and analyzed. Each case's
+peak von Mises stress is compared against the reference case, next to its dofs, solve time and
+peak memory. The peak is taken in DG(k-1) rather than from the DG0 cell averages, so a coarse
+P2 mesh is not penalized for averaging away its interface stress.
+"""
+import copy
+import csv
+import os
+import main
+
+def case_fields(case):
+    cycle_fields = copy.deepcopy(main.fields)
+    cycle_fields.update(case)
+    # Keep the benchmark cheap: only the primary solve is timed
+    cycle_fields["multi_load"] = False
+    cycle_fields["material_sweep"] = False
+    return cycle_fields
+
+def peak_stress(row):
+    return row.get("vms_max_pointwise", row["vms_max"])
+
+def benchmark():
+    params = main.fields["benchmark_params"]
+    packing = params.get("packing")
+
+    if packing:
+        packing = main.script_path.parent / packing
+    else:
+        packing = main.results_path / "benchmark_packing.npz"
+        generator = main.build_generator(main.fields)
+        generator.generate_packing()
+        generator.save_packing(packing)
+        main.console.log(f"[green]Saved benchmark packing to {packing}[/green]")
+
+    cases = [("reference", params["reference"])] + [(f"case{k}", case) for k, case in enumerate(params["cases"])]
+    results = []
+    for job_id, (name, case) in enumerate(cases):
+        main.console.log(f"[cyan]Benchmark {name}: {case}[/cyan]")
+        row, timings = main.run_cycle(
+            job_id, case_fields(case),
+            results_dir=main.records_path / str(job_id),
+            packing=packing
+        )
+        if row is None:
+            main.console.log(f"[red]Benchmark {name} failed[/red]")
+            continue
+        results.append((name, case, row, timings))
+
+    reference = next((row for name, _, row, _ in results if name == "reference"), None)
+    if reference is None:
+        main.console.log("[red]Reference case failed, no errors to report[/red]")
+        return
+
+    with open(os.path.join(main.results_path, "benchmark.csv"), "w", newline="") as bench_file:
+        writer = csv.writer(bench_file)
+        writer.writerow(['case', 'element_order', 'curved_geometry', 'mesh_element_size', 'dofs',
+                         'generate_time', 'solve_time', 'peak_memory_mb', 'vms_max', 'vms_max_error'])
+        for name, case, row, timings in results:
+            error = abs(peak_stress(row) - peak_stress(reference)) / abs(peak_stress(reference))
+            writer.writerow([
+                name,
+                row["element_order"],
+                case.get("curved_geometry", False),
+                case.get("mesh_element_size", main.fields["mesh_element_size"]),
+                row["dofs"],
+                timings["generate"],
+                row["solve_time"],
+                row["peak_memory_mb"],
+                peak_stress(row),
+                error
+            ])
+            main.console.log(f"[green]{name}: {row['dofs']} dofs, solve {row['solve_time']:.2f}s, "
+                             f"{row['peak_memory_mb']:.0f} MB, vms_max error {100 * error:.2f}%[/green]")
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,231 @@
+import gmsh
+import math
+
+# Direct construction of the clipped-circle geometry with the built-in gmsh kernel. The
+# packing guarantees that circles do not overlap, so the pieces are known up front:
+# interior disks, circles clipped by the rectangle (their arcs plus the boundary stretches
+# they cover) and the matrix, whose outer loops follow the rectangle and detour along the
+# arcs. Degenerate cases (tangencies, intersections on a corner, a circle covering the whole
+# boundary) make build_direct_geometry return None so the caller can fall back to the OCC
+# fragment.
+
+def perimeter_point(s, x0, y0, x1, y1):
+    w, h = x1 - x0, y1 - y0
+    s = s % (2 * (w + h))
+    if s < w:
+        return x0 + s, y0
+    if s < w + h:
+        return x1, y0 + (s - w)
+    if s < 2 * w + h:
+        return x1 - (s - w - h), y1
+    return x0, y1 - (s - 2 * w - h)
+
+def perimeter_side(s, x0, y0, x1, y1):
+    w, h = x1 - x0, y1 - y0
+    s = s % (2 * (w + h))
+    if s < w:
+        return "bottom"
+    if s < w + h:
+        return "right"
+    if s < 2 * w + h:
+        return "top"
+    return "left"
+
+def boundary_crossings(cx, cy, r, x0, y0, x1, y1, tol):
+    # Perimeter positions where the circle crosses the rectangle, None when degenerate
+    w, h = x1 - x0, y1 - y0
+    sides = [
+        (y0, True, x0, x1, lambda x: x - x0),
+        (x1, False, y0, y1, lambda y: w + (y - y0)),
+        (y1, True, x0, x1, lambda x: w + h + (x1 - x)),
+        (x0, False, y0, y1, lambda y: 2 * w + h + (y1 - y)),
+    ]
+    crossings = []
+    for line, horizontal, lo, hi, position in sides:
+        offset = line - (cy if horizontal else cx)
+        disc = r * r - offset * offset
+        if abs(disc) <= tol * r:
+            return None
+        if disc < 0:
+            continue
+        root = math.sqrt(disc)
+        center = cx if horizontal else cy
+        for t in (center - root, center + root):
+            if abs(t - lo) <= tol or abs(t - hi) <= tol:
+                return None
+            if lo < t < hi:
+                crossings.append(position(t))
+    return sorted(crossings)
+
+def inside_rect(x, y, x0, y0, x1, y1):
+    return x0 < x < x1 and y0 < y < y1
+
+def arc_inside(cx, cy, r, p_from, p_to, x0, y0, x1, y1):
+    # Start angle, signed sweep of the arc between two crossings that stays in the rectangle
+    theta_from = math.atan2(p_from[1] - cy, p_from[0] - cx)
+    theta_to = math.atan2(p_to[1] - cy, p_to[0] - cx)
+    span = (theta_to - theta_from) % (2 * math.pi)
+    mid = theta_from + 0.5 * span
+    if inside_rect(cx + r * math.cos(mid), cy + r * math.sin(mid), x0, y0, x1, y1):
+        return theta_from, span
+    return theta_from, span - 2 * math.pi
+
+def inside_polygon(x, y, polygon):
+    inside = False
+    for (xa, ya), (xb, yb) in zip(polygon, polygon[1:] + polygon[:1]):
+        if (ya > y) != (yb > y) and x < xa + (y - ya) * (xb - xa) / (yb - ya):
+            inside = not inside
+    return inside
+
+def build_direct_geometry(circles, x0, y0, x1, y1, mesh_element_size, tol=1e-9, boundary_size=None):
+    w, h = x1 - x0, y1 - y0
+    perimeter = 2 * (w + h)
+
+    # Sort circles into interior disks and clipped ones; a clipped circle owns the
+    # perimeter intervals it covers and one arc between each exit and the next entry
+    interior = []
+    clipped = []
+    for cx, cy, r in circles:
+        dx = max(x0 - cx, 0.0, cx - x1)
+        dy = max(y0 - cy, 0.0, cy - y1)
+        if math.hypot(dx, dy) >= r - tol:
+            continue
+        if cx - r > x0 + tol and cx + r < x1 - tol and cy - r > y0 + tol and cy + r < y1 - tol:
+            interior.append((cx, cy, r))
+            continue
+
+        crossings = boundary_crossings(cx, cy, r, x0, y0, x1, y1, tol)
+        if not crossings or len(crossings) % 2:
+            return None
+        intervals = []
+        m = len(crossings)
+        for j in range(m):
+            s_a = crossings[j]
+            s_b = crossings[(j + 1) % m] + (perimeter if j == m - 1 else 0.0)
+            mx, my = perimeter_point(0.5 * (s_a + s_b), x0, y0, x1, y1)
+            if math.hypot(mx - cx, my - cy) < r:
+                intervals.append((s_a, s_b))
+        if not intervals:
+            return None
+        clipped.append({"circle": (cx, cy, r), "intervals": intervals})
+
+    # Perimeter breakpoints: corners plus every entry/exit point
+    breakpoints = [0.0, w, w + h, 2 * w + h]
+    for c in clipped:
+        for s_in, s_out in c["intervals"]:
+            breakpoints += [s_in % perimeter, s_out % perimeter]
+    breakpoints.sort()
+    for a, b in zip(breakpoints, breakpoints[1:] + [breakpoints[0] + perimeter]):
+        if b - a <= tol:
+            return None
+    n = len(breakpoints)
+
+    def breakpoint_index(s):
+        s = s % perimeter
+        return min(range(n), key=lambda k: min(abs(breakpoints[k] - s), perimeter - abs(breakpoints[k] - s)))
+
+    segments = []
+    for k in range(n):
+        s_next = breakpoints[(k + 1) % n] + (perimeter if k == n - 1 else 0.0)
+        s_mid = 0.5 * (breakpoints[k] + s_next)
+        segments.append({"owner": None, "side": perimeter_side(s_mid, x0, y0, x1, y1)})
+    for idx, c in enumerate(clipped):
+        c["bounds"] = []
+        for s_in, s_out in c["intervals"]:
+            first, last = breakpoint_index(s_in), breakpoint_index(s_out)
+            c["bounds"].append((first, last))
+            k = first
+            while k != last:
+                if segments[k]["owner"] is not None:
+                    return None
+                segments[k]["owner"] = idx
+                k = (k + 1) % n
+    if all(seg["owner"] is not None for seg in segments):
+        return None
+
+    geo = gmsh.model.geo
+    lc = mesh_element_size
+
+    points = [perimeter_point(s, x0, y0, x1, y1) for s in breakpoints]
+    point_tags = [geo.addPoint(x, y, 0, lc) for x, y in points]
+    for k, seg in enumerate(segments):
+        seg["tag"] = geo.addLine(point_tags[k], point_tags[(k + 1) % n])
+        seg["polyline"] = [points[k]]
+        if boundary_size is not None:
+            # Uniform node spacing that only depends on the segment itself, so a neighbouring
+            # rectangle sharing this stretch of boundary gets the same nodes
+            length = math.dist(points[k], points[(k + 1) % n])
+            geo.mesh.setTransfiniteCurve(seg["tag"], max(2, math.ceil(length / boundary_size - 1e-9) + 1))
+
+    # Arcs run from each exit to the next entry of the same circle. arc_into[k] is the arc
+    # ending at entry breakpoint k, which the matrix boundary follows backwards.
+    arc_into = {}
+    circle_surfaces = []
+    for c in clipped:
+        cx, cy, r = c["circle"]
+        center = geo.addPoint(cx, cy, 0, lc)
+        loop = []
+        bounds = c["bounds"]
+        for j, (first, last) in enumerate(bounds):
+            k = first
+            while k != last:
+                loop.append(segments[k]["tag"])
+                k = (k + 1) % n
+            entry = bounds[(j + 1) % len(bounds)][0]
+            theta, sweep = arc_inside(cx, cy, r, points[last], points[entry], x0, y0, x1, y1)
+            pieces = max(1, math.ceil(abs(sweep) / (0.5 * math.pi) - 1e-12))
+            arc_points = [point_tags[last]]
+            for p in range(1, pieces):
+                angle = theta + sweep * p / pieces
+                arc_points.append(geo.addPoint(cx + r * math.cos(angle), cy + r * math.sin(angle), 0, lc))
+            arc_points.append(point_tags[entry])
+            arcs = [geo.addCircleArc(arc_points[p], center, arc_points[p + 1]) for p in range(pieces)]
+            polyline = [(cx + r * math.cos(theta + sweep * p / 16), cy + r * math.sin(theta + sweep * p / 16)) for p in range(16)]
+            arc_into[entry] = {"tags": arcs, "start": last, "polyline": polyline}
+            loop += arcs
+        circle_surfaces.append(geo.addPlaneSurface([geo.addCurveLoop(loop)]))
+
+    # Matrix pieces: walk unowned perimeter segments counterclockwise and, at each entry
+    # point, go back along the arc that ends there to the previous exit of that circle
+    faces = []
+    visited = set()
+    for start in range(n):
+        if segments[start]["owner"] is not None or start in visited:
+            continue
+        loop, polygon = [], []
+        k = start
+        while True:
+            if segments[k]["owner"] is None:
+                visited.add(k)
+                loop.append(segments[k]["tag"])
+                polygon += segments[k]["polyline"]
+                k = (k + 1) % n
+            else:
+                arc = arc_into[k]
+                loop += [-tag for tag in reversed(arc["tags"])]
+                polygon += [points[k]] + list(reversed(arc["polyline"][1:]))
+                k = arc["start"]
+            if k == start:
+                break
+        faces.append({"loop": geo.addCurveLoop(loop), "polygon": polygon, "holes": []})
+
+    for cx, cy, r in interior:
+        center = geo.addPoint(cx, cy, 0, lc)
+        ring = [geo.addPoint(cx + r * math.cos(a), cy + r * math.sin(a), 0, lc)
+                for a in (0.0, 0.5 * math.pi, math.pi, 1.5 * math.pi)]
+        arcs = [geo.addCircleArc(ring[j], center, ring[(j + 1) % 4]) for j in range(4)]
+        loop = geo.addCurveLoop(arcs)
+        circle_surfaces.append(geo.addPlaneSurface([loop]))
+        face = faces[0]
+        if len(faces) > 1:
+            face = next((f for f in faces if inside_polygon(cx, cy, f["polygon"])), faces[0])
+        face["holes"].append(loop)
+
+    background = [geo.addPlaneSurface([face["loop"]] + face["holes"]) for face in faces]
+    geo.synchronize()
+
+    groups = {"circles": circle_surfaces, "background": background,
+              "bottom": [], "right": [], "top": [], "left": []}
+    for seg in segments:
+        groups[seg["side"]].append(seg["tag"])
+    return groups
@@ -3,13 +3,29 @@ from rich.panel import Panel
 from rich.text import Text
 from rich import box
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import argparse
 import openmatrix as opmx
 import sys
 import os
 import parser
+import stats
+import sweep
+import surrogate
+import archive
+import telemetry
+import sampling
+import meanfield
+import numpy as np
+import copy
+import random
+import multiprocessing
 import subprocess
+import shutil
+import threading
+import queue
 import json
+import time
 import csv
 
 # WARNING: Moving this file may break functionality due to relative paths.
@@ -24,8 +40,7 @@ console = Console()
 data_parser = parser.Parser()
 fields = data_parser.parsejson(config)
 
-def genmeshes():
-
+def init_results():
     # CSV Write
     csv_name = os.path.join(results_path, "data.csv")
     os.system("touch " + csv_name)
@@ -34,10 +49,7 @@ def genmeshes():
     writer.writerow(['id', 'circles', 'vms_max', 'vms_mean', 'area_fraction', 'size'])
     csv_file.close()
 
-    
-    ramp_circle_value = fields["ramp_circles_params"]["start"]
-    ramp_layout_value = [fields["ramp_layout_params"]["start_x"], fields["ramp_layout_params"]["start_y"]]
-
+def model_arg():
     model = fields["model_form"]
 
     arg = ""
@@ -49,66 +61,521 @@ def genmeshes():
         arg = "-bc"
     elif model == "meanvis":
         arg = "-bv"
+    return arg
 
-    for i in range(fields["cycles"]):
-        if not os.path.exists(records_path):
-            os.mkdir(records_path)
-        path_name = records_path / str(i)
-        if os.path.exists(path_name):
-            os.system("rm -rf " + str(path_name))
-        os.mkdir(path_name)
-        mesh_save_path = path_name / ("mesh" + str(i) + ".xdmf")
-        console.log(f"[green]Generating mesh {str(i)} stored at {mesh_save_path}[/green]")
-
-        # TODO: Organize this clutter
-        generator = opmx.MeshGenerator(
-            layout=fields["layout"] if not fields["ramp_layout"] else ramp_layout_value,
-            size=fields["size"],
-            mesh_element_size=fields["mesh_element_size"],
-            circles=fields["control_circles_params"]["circles"] if not fields["ramp_circles"] else ramp_circle_value,
-            randomized_max_radius=fields["random_params"]["randomized_max_radius"],
-            circ_distribution_type=fields["distribution"],
-            set_circle_radius=fields["control_circles_params"]["set_circle_radius"],
-            randomized_radius=fields["randomized_radius"],
-            min_fraction_inside=fields["min_fraction_inside"],
-            circ_af=[fields["control_af"], fields["af_options"]["const_percentage"], fields["af_options"]["error_bound_percentage"]]
+def build_monitor():
+    if not fields.get("early_stop", False):
+        return None
+    es = fields["early_stop_params"]
+    return stats.StudyMonitor(
+        fields=es.get("fields", ["vms_max", "vms_mean"]),
+        quantiles=es.get("quantiles", [0.5, 0.95]),
+        confidence=es.get("confidence", 0.95),
+        ci_width_percentage=es["ci_width_percentage"],
+        min_cycles=es.get("min_cycles", 10)
+    )
+
+def mesh_setting(cycle_fields, name):
+    # "auto" picks up what autotune.py measured, or the generator default if it never ran or
+    # was tuned for another element size or layout
+    value = cycle_fields.get(name)
+    if value == "auto":
+        tuned_file = results_path / "autotune.json"
+        if not os.path.exists(tuned_file):
+            return None
+        tuned = json.load(open(tuned_file, "r"))
+        mismatched = [key for key in ("mesh_element_size", "layout")
+                      if key in tuned and not np.allclose(np.ravel(tuned[key]).astype(float), np.ravel(cycle_fields[key]).astype(float))]
+        if mismatched:
+            console.log(f"[red]{tuned_file} was tuned for a different {', '.join(mismatched)}, using the default {name}[/red]")
+            return None
+        return tuned.get(name)
+    return value
+
+def build_generator(cycle_fields, comm=None):
+    return opmx.MeshGenerator(
+        layout=cycle_fields["layout"],
+        size=cycle_fields["size"],
+        mesh_element_size=cycle_fields["mesh_element_size"],
+        circles=cycle_fields["control_circles_params"]["circles"],
+        randomized_max_radius=cycle_fields["random_params"]["randomized_max_radius"],
+        circ_distribution_type=cycle_fields["distribution"],
+        set_circle_radius=cycle_fields["control_circles_params"]["set_circle_radius"],
+        randomized_radius=cycle_fields["randomized_radius"],
+        min_fraction_inside=cycle_fields["min_fraction_inside"],
+        circ_af=[cycle_fields["control_af"], cycle_fields["af_options"]["const_percentage"], cycle_fields["af_options"]["error_bound_percentage"]],
+        comm=comm,
+        min_gap=cycle_fields.get("placement_params", {}).get("min_gap", 0.0),
+        max_elements=cycle_fields.get("mesh_budget", {}).get("max_elements"),
+        max_regenerations=cycle_fields.get("mesh_budget", {}).get("max_regenerations", 5),
+        save_packing=cycle_fields.get("save_packing", False),
+        element_order=cycle_fields.get("element_order", 1),
+        curved_geometry=cycle_fields.get("curved_geometry", False),
+        geometry_builder=cycle_fields.get("geometry_builder", "occ"),
+        tiles=cycle_fields.get("tiling_params", {}).get("tiles") if cycle_fields.get("tiling", False) else None,
+        tile_workers=cycle_fields.get("tiling_params", {}).get("workers"),
+        mesh_algorithm=mesh_setting(cycle_fields, "mesh_algorithm"),
+        mesh_smoothing=mesh_setting(cycle_fields, "mesh_smoothing"),
+        placement=cycle_fields.get("placement_params", {}).get("mode", "random"),
+        max_radius_tries=cycle_fields.get("placement_params", {}).get("max_radius_tries", 500),
+        af_targeting=cycle_fields["af_options"].get("targeting", "rollback"),
+        undershoot_percentage=cycle_fields["af_options"].get("undershoot_percentage", 1.0)
+    )
+
+def analysis_command(analysis_path, mesh_save_path, results_dir, cycle_config, create_files, nested=False):
+    args = [analysis_path, mesh_save_path, results_dir, cycle_config, create_files]
+    if nested:
+        # Already inside an MPI job: mpirun cannot be nested, run as a singleton instead
+        return ["python3"] + args
+    return ["mpirun", "-np", "1", "python3"] + args
+
+def singleton_env():
+    return {k: v for k, v in os.environ.items() if not k.startswith(("OMPI_", "PMI_", "PMIX_", "HYDRA_"))}
+
+def record_paths(i):
+    path_name = records_path / str(i)
+    return path_name, path_name / ("mesh" + str(i) + ".xdmf"), path_name / "config.json"
+
+def generate_cycle(i, cycle_fields, timings, comm=None, packing=None, ramp_state=None):
+    if not os.path.exists(records_path):
+        os.makedirs(records_path, exist_ok=True)
+    path_name, mesh_save_path, cycle_config = record_paths(i)
+    if os.path.exists(path_name):
+        os.system("rm -rf " + str(path_name))
+    os.mkdir(path_name)
+    console.log(f"[green]Generating mesh {str(i)} stored at {mesh_save_path}[/green]")
+
+    # Analysis reads the config of this cycle, not the top level one
+    json.dump(cycle_fields, open(cycle_config, "w"), indent=4)
+
+    # Seeded cycles (sampling designs, sweep jobs with a seed) reproduce the same packing
+    if cycle_fields.get("seed") is not None:
+        random.seed(cycle_fields["seed"])
+        np.random.seed(cycle_fields["seed"] % 2**32)
+
+    start = time.perf_counter()
+    generator = build_generator(cycle_fields, comm=comm)
+    if ramp_state and packing is None:
+        if generator.seed_packing(ramp_state["circles"], ramp_state["layout"]):
+            console.log(f"[cyan]Reusing {len(ramp_state['circles'])} circles from the previous ramp step[/cyan]")
+        else:
+            console.log(f"[red]Previous ramp step does not fit mesh {i}, packing from scratch[/red]")
+    try:
+        if packing is not None:
+            generator.generate_from_packing(packing, visualize=False, save_path=mesh_save_path)
+        else:
+            generator.generate(save_path=mesh_save_path, visualize=False)
+    except RuntimeError as e:
+        console.log(f"[red]Mesh generation rejected for mesh {i}: {e}[/red]")
+        timings["generate"] = time.perf_counter() - start
+        return False
+    timings["generate"] = time.perf_counter() - start
+    if ramp_state is not None:
+        ramp_state["circles"] = list(generator.primary_circles)
+        ramp_state["layout"] = [generator.layout_x, generator.layout_y]
+    return True
+
+def analyze_cycle(i, cycle_fields, timings, results_dir=None, nested=False):
+    if results_dir is None:
+        results_dir = results_path
+    path_name, mesh_save_path, cycle_config = record_paths(i)
+
+    analysis_path = os.path.join(script_path, "analysis.py")
+    start = time.perf_counter()
+    try:
+        create_files = "0"
+        if cycle_fields["create_mesh_files"]:
+            create_files = "1"
+        subprocess.run(
+            analysis_command(analysis_path, mesh_save_path, results_dir, cycle_config, create_files, nested),
+            cwd=path_name,
+            env=singleton_env() if nested else None,
+            check=True
         )
-        generator.generate(save_path=mesh_save_path, visualize=False)
-
-        analysis_path = os.path.join(script_path, "analysis.py")
-        model_path = os.path.join(script_path, "model.py")
-        try:
-            create_files = "0"
-            if fields["create_mesh_files"]:
-                create_files = "1"
-            subprocess.run(
-                [
-                    "mpirun", "-np", "1", "python3", 
-                    analysis_path, 
-                    mesh_save_path, 
-                    results_path, 
-                    str(script_path / config), 
-                    create_files
-                ],
-                cwd=path_name,
-                check=True
-            )
-            console.log(f"[green]Analysis complete for mesh {i}[/green]")
-        except subprocess.CalledProcessError as e:
-            console.log(f"[green]Analysis failed for mesh {i}: {e}[/green]")
+        console.log(f"[green]Analysis complete for mesh {i}[/green]")
+    except subprocess.CalledProcessError as e:
+        console.log(f"[green]Analysis failed for mesh {i}: {e}[/green]")
+    timings["analysis"] = time.perf_counter() - start
+
+    result_file = path_name / "result.json"
+    if not os.path.exists(result_file):
+        return None
+    return data_parser.parsejson(result_file)
+
+def run_cycle(i, cycle_fields, comm=None, results_dir=None, nested=False, packing=None, ramp_state=None):
+    timings = {}
+    if not generate_cycle(i, cycle_fields, timings, comm=comm, packing=packing, ramp_state=ramp_state):
+        timings["analysis"] = 0.0
+        return None, timings
+    return analyze_cycle(i, cycle_fields, timings, results_dir=results_dir, nested=nested), timings
+
+def cycle_jobs():
+    ramp_circle_value = fields["ramp_circles_params"]["start"]
+    ramp_layout_value = [fields["ramp_layout_params"]["start_x"], fields["ramp_layout_params"]["start_y"]]
+    ramp_af_value = fields.get("ramp_af_params", {}).get("start")
+    design = sampling_design() if fields.get("sampling", False) else None
+
+    for i in range(fields["cycles"]):
+        cycle_fields = copy.deepcopy(fields)
+        if fields["ramp_layout"]:
+            cycle_fields["layout"] = list(ramp_layout_value)
+        if fields["ramp_circles"]:
+            cycle_fields["control_circles_params"]["circles"] = ramp_circle_value
+        if fields.get("ramp_af", False):
+            cycle_fields["af_options"]["const_percentage"] = ramp_af_value
+        if design is not None:
+            cycle_fields = sweep.apply_overrides(cycle_fields, design[i])
+        yield i, cycle_fields
+
         ramp_circle_value += fields["ramp_circles_params"]["step"]
         ramp_layout_value[0] += fields["ramp_layout_params"]["step_x"]
         ramp_layout_value[1] += fields["ramp_layout_params"]["step_y"]
-        
+        if fields.get("ramp_af", False):
+            ramp_af_value += fields["ramp_af_params"]["step"]
+
+def sampling_design():
+    jobs = sampling.design_jobs(fields["sampling_params"], fields["cycles"])
+
+    with open(os.path.join(results_path, "sampling_jobs.csv"), "w", newline="") as jobs_file:
+        writer = csv.writer(jobs_file)
+        writer.writerow(['id', 'job'])
+        for job_id, job in enumerate(jobs):
+            writer.writerow([job_id, json.dumps(job, sort_keys=True)])
+    return jobs
+
+def incremental_ramp():
+    # Each ramp step starts from the packing of the one before, cycles have to run in order
+    if fields.get("sampling", False):
+        return False
+    return fields.get("incremental_ramp", False) and (fields["ramp_circles"] or fields.get("ramp_af", False))
+
+def write_row(row):
+    csv_file = open(os.path.join(results_path, "data.csv"), "a", newline="")
+    writer = csv.writer(csv_file)
+    writer.writerow([int(row["id"]), row["circles"], row["vms_max"], row["vms_mean"], row["area_fraction"], row["size"]])
+    csv_file.close()
+    if row.get("moduli"):
+        append_rows("moduli.csv", ["id"] + list(row["moduli"]), [[int(row["id"])] + list(row["moduli"].values())])
+    if row.get("material_sweep"):
+        append_rows("material_sweep.csv", ["id"] + list(row["material_sweep"][0]),
+                    [[int(row["id"])] + list(point.values()) for point in row["material_sweep"]])
+
+def append_rows(name, header, rows):
+    csv_name = os.path.join(results_path, name)
+    new_file = not os.path.exists(csv_name)
+    csv_file = open(csv_name, "a", newline="")
+    writer = csv.writer(csv_file)
+    if new_file:
+        writer.writerow(header)
+    writer.writerows(rows)
+    csv_file.close()
+
+def open_archive():
+    if fields.get("output_mode", "records") != "archive":
+        return None
+    return archive.StudyArchive(results_path / fields.get("archive_name", "study.h5"), mode="w")
+
+def collect_record(i):
+    # In archive mode the record directory is only a staging area for one cycle
+    if fields.get("output_mode", "records") != "archive":
+        return None
+    path_name = records_path / str(i)
+    payload = None
+    if os.path.exists(path_name / ("mesh" + str(i) + ".xdmf")):
+        payload = archive.read_record(path_name, i)
+    shutil.rmtree(path_name, ignore_errors=True)
+    return payload
+
+def archive_cycle(study_archive, i, payload):
+    if study_archive is not None and payload is not None:
+        study_archive.write_cycle(i, payload)
+
+def open_telemetry(total, workers=1, mode="serial"):
+    return telemetry.Telemetry(results_path / "telemetry.jsonl", total=total, workers=workers, mode=mode)
+
+def run_model():
+    model_path = os.path.join(script_path, "model.py")
     try:
         subprocess.run(
-            ["python3", model_path, arg, results_path],
+            ["python3", model_path, model_arg(), results_path],
             check=True
         )
         console.log(f"[green]Model completed[/green]")
     except subprocess.CalledProcessError as e:
         console.log(f"[green]Modeling Failed: {e}[/green]")
 
+def finish_cycle(i, row, timings, study_archive, progress, monitor, queued=0, running=0):
+    archive_cycle(study_archive, i, collect_record(i))
+    progress.record(i, timings, ok=row is not None, queued=queued, running=running)
+    if monitor is not None and update_monitor(monitor, row):
+        console.log(f"[green]Statistics converged after {progress.completed} cycles, stopping early[/green]")
+        return True
+    return False
+
+def pipelined_cycles(study_archive, progress, monitor, ramp_state):
+    # gmsh stays in the main thread (it installs signal handlers), the analysis subprocess
+    # is waited on from a consumer thread. At most queue_depth meshed cycles wait on disk.
+    depth = fields.get("pipeline_params", {}).get("queue_depth", 2)
+    meshed = queue.Queue(maxsize=max(depth, 1))
+    stop = threading.Event()
+    errors = []
+
+    def consume():
+        # Drain until the sentinel even after a failure, so the producer never blocks on a
+        # full queue; cycles still queued after a stop or an error are discarded
+        while True:
+            item = meshed.get()
+            if item is None:
+                break
+            i, cycle_fields, timings, ok = item
+            if stop.is_set():
+                shutil.rmtree(records_path / str(i), ignore_errors=True)
+                continue
+            try:
+                row = None
+                timings["analysis"] = 0.0
+                if ok:
+                    row = analyze_cycle(i, cycle_fields, timings)
+                if finish_cycle(i, row, timings, study_archive, progress, monitor, queued=meshed.qsize()):
+                    stop.set()
+            except Exception as e:
+                errors.append(e)
+                stop.set()
+
+    consumer = threading.Thread(target=consume, name="analysis")
+    consumer.start()
+    try:
+        for i, cycle_fields in cycle_jobs():
+            if stop.is_set():
+                break
+            timings = {}
+            ok = generate_cycle(i, cycle_fields, timings, ramp_state=ramp_state)
+            # Backpressure: block while the analysis stage is queue_depth cycles behind
+            while not stop.is_set():
+                try:
+                    meshed.put((i, cycle_fields, timings, ok), timeout=1.0)
+                    break
+                except queue.Full:
+                    continue
+            else:
+                shutil.rmtree(records_path / str(i), ignore_errors=True)
+    finally:
+        meshed.put(None)
+        consumer.join()
+    if errors:
+        raise errors[0]
+
+def genmeshes():
+    init_results()
+
+    monitor = build_monitor()
+    study_archive = open_archive()
+    ramp_state = {} if incremental_ramp() else None
+
+    if fields.get("pipeline", False):
+        progress = open_telemetry(fields["cycles"], workers=2, mode="pipeline")
+        pipelined_cycles(study_archive, progress, monitor, ramp_state)
+    else:
+        progress = open_telemetry(fields["cycles"])
+        for i, cycle_fields in cycle_jobs():
+            row, timings = run_cycle(i, cycle_fields, ramp_state=ramp_state)
+            if finish_cycle(i, row, timings, study_archive, progress, monitor, queued=fields["cycles"] - i - 1):
+                break
+
+    if monitor is not None:
+        json.dump(monitor.summary(), open(os.path.join(results_path, "stats.json"), "w"), indent=4)
+    if study_archive is not None:
+        study_archive.close()
+
+    run_model()
+
+def run_job(job_id, job):
+    row, timings = run_cycle(job_id, sweep.apply_overrides(fields, job))
+    return job_id, row, timings, collect_record(job_id)
+
+def expand_sweep():
+    jobs = sweep.expand_jobs(fields, fields["sweep_params"])
+
+    with open(os.path.join(results_path, "sweep_jobs.csv"), "w", newline="") as jobs_file:
+        writer = csv.writer(jobs_file)
+        writer.writerow(['id', 'job'])
+        for job_id, job in enumerate(jobs):
+            writer.writerow([job_id, json.dumps(job, sort_keys=True)])
+    return list(enumerate(jobs))
+
+def runsweep():
+    init_results()
+
+    jobs = expand_sweep()
+    workers = fields["sweep_params"].get("workers", os.cpu_count())
+    console.log(f"[green]Sweep expanded to {len(jobs)} jobs on {workers} workers[/green]")
+
+    # Spawned workers start their own MPI singleton instead of inheriting ours through fork
+    study_archive = open_archive()
+    progress = open_telemetry(len(jobs), workers=workers, mode="sweep")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = [pool.submit(run_job, job_id, job) for job_id, job in jobs]
+        for future in as_completed(futures):
+            job_id, row, timings, payload = future.result()
+            if row is None:
+                console.log(f"[red]Sweep job {job_id} produced no result[/red]")
+            archive_cycle(study_archive, job_id, payload)
+            pending = len(jobs) - progress.completed - 1
+            progress.record(job_id, timings, ok=row is not None,
+                            queued=max(pending - workers, 0), running=min(pending, workers))
+    if study_archive is not None:
+        study_archive.close()
+
+    run_model()
+
+def runactive():
+    params = fields["active_params"]
+    bounds = params["bounds"]
+    target = params.get("target", "vms_max")
+    for name in bounds:
+        if name not in ("area_fraction", "circles"):
+            raise ValueError(f"Active learning feature must be a result column and sweep axis: {name}")
+
+    # Rows already in data.csv seed the surrogate and stand in for the random initial cycles.
+    # They are kept in data.csv and new cycles are numbered after them.
+    X, y = [], []
+    previous_rows = []
+    data_file = results_path / "data.csv"
+    if params.get("reuse_results", False) and os.path.exists(data_file):
+        X, y = (values.tolist() for values in surrogate.load_results(data_file, list(bounds), target))
+        with open(data_file, "r", newline="") as previous_file:
+            previous_rows = list(csv.reader(previous_file))[1:]
+        console.log(f"[cyan]Seeding the surrogate with {len(y)} results from {data_file}[/cyan]")
+    init_results()
+    if previous_rows:
+        append_rows("data.csv", [], previous_rows)
+    first_id = max((int(r[0]) for r in previous_rows if r), default=-1) + 1
+
+    rng = np.random.default_rng(params.get("seed"))
+    model = None
+
+    log_file = open(os.path.join(results_path, "active_learning.csv"), "w", newline="")
+    log_writer = csv.writer(log_file)
+    log_writer.writerow(['id', 'job', 'predicted_mean', 'predicted_std'])
+    study_archive = open_archive()
+    progress = open_telemetry(params["initial"] + params["iterations"], mode="active")
+
+    for i in range(first_id, first_id + params["initial"] + params["iterations"]):
+        if len(y) < max(params["initial"], 2):
+            names, candidates = surrogate.candidate_points(bounds, 1, rng)
+            point, mean, std = candidates[0], float("nan"), float("nan")
+        else:
+            model = surrogate.GaussianProcess(seed=params.get("seed")).fit(X, y)
+            names, candidates = surrogate.candidate_points(bounds, params.get("candidates", 500), rng)
+            point, mean, std = surrogate.most_uncertain(model, candidates)
+
+        job = {name: int(round(value)) if name == "circles" else float(value) for name, value in zip(names, point)}
+        console.log(f"[cyan]Active learning cycle {i}: {job} (predicted {mean:.4e} +- {std:.4e})[/cyan]")
+        log_writer.writerow([i, json.dumps(job, sort_keys=True), mean, std])
+        log_file.flush()
+
+        row, timings = run_cycle(i, sweep.apply_overrides(fields, job))
+        archive_cycle(study_archive, i, collect_record(i))
+        progress.record(i, timings, ok=row is not None, queued=first_id + params["initial"] + params["iterations"] - i - 1)
+        if row is not None:
+            X.append([float(row[name]) for name in names])
+            y.append(float(row[target]))
+    log_file.close()
+    if study_archive is not None:
+        study_archive.close()
+
+    if len(y) >= 2:
+        model = surrogate.GaussianProcess(seed=params.get("seed")).fit(X, y)
+        names, candidates = surrogate.candidate_points(bounds, params.get("candidates", 500), rng)
+        mean, std = model.predict(candidates)
+        with open(os.path.join(results_path, "surrogate.csv"), "w", newline="") as surrogate_file:
+            writer = csv.writer(surrogate_file)
+            writer.writerow(names + [f"{target}_mean", f"{target}_std"])
+            for point, m, sd in zip(candidates, mean, std):
+                writer.writerow(list(point) + [m, sd])
+
+    run_model()
+
+def runremesh():
+    init_results()
+
+    params = fields["remesh_params"]
+    packing = script_path.parent / params["packing"]
+    if not os.path.exists(packing):
+        console.log(f"[red]Packing {packing} not found, run a study with save_packing enabled first[/red]")
+        return
+
+    with open(os.path.join(results_path, "remesh_jobs.csv"), "w", newline="") as jobs_file:
+        writer = csv.writer(jobs_file)
+        writer.writerow(['id', 'mesh_element_size'])
+        for i, h in enumerate(params["mesh_element_sizes"]):
+            writer.writerow([i, h])
+
+    # Packings are read from records, so keep a copy outside of the records being rewritten
+    packing_copy = results_path / "remesh_packing.npz"
+    shutil.copyfile(packing, packing_copy)
+
+    study_archive = open_archive()
+    progress = open_telemetry(len(params["mesh_element_sizes"]), mode="remesh")
+    for i, h in enumerate(params["mesh_element_sizes"]):
+        cycle_fields = copy.deepcopy(fields)
+        cycle_fields["mesh_element_size"] = h
+        console.log(f"[cyan]Remeshing {packing} with element size {h}[/cyan]")
+        row, timings = run_cycle(i, cycle_fields, packing=packing_copy)
+        archive_cycle(study_archive, i, collect_record(i))
+        progress.record(i, timings, ok=row is not None, queued=len(params["mesh_element_sizes"]) - i - 1)
+    if study_archive is not None:
+        study_archive.close()
+
+    run_model()
+
+def runanalytical():
+    params = fields.get("analytical_params", {})
+    method = params.get("method", "mori_tanaka")
+    materials = fields.get("materials", {})
+    phases = [(materials.get("inclusion", (7.8e9, 0.33)), materials.get("matrix", (1.65e11, 0.3)))]
+    if fields.get("material_sweep", False):
+        sweep_materials = fields["material_sweep_params"]
+        phases = [(inc, mat) for inc in sweep_materials["inclusion"] for mat in sweep_materials["matrix"]]
+
+    points = sweep.expand_grid(fields["sweep_params"])
+    start = time.perf_counter()
+    with open(os.path.join(results_path, "analytical.csv"), "w", newline="") as analytical_file:
+        writer = csv.writer(analytical_file)
+        writer.writerow(['id', 'circles', 'vms_max', 'vms_mean', 'area_fraction', 'size', 'method',
+                         'job', 'E_inclusion', 'nu_inclusion', 'E_matrix', 'nu_matrix', 'K_eff', 'G_eff', 'stress_concentration'])
+        i = 0
+        for point in points:
+            cycle_fields = sweep.apply_overrides(fields, point)
+            for inclusion, matrix in phases:
+                row = meanfield.screen_point(cycle_fields, inclusion, matrix, method, params.get("angles", 360))
+                writer.writerow([i, row["circles"], row["vms_max"], row["vms_mean"], row["area_fraction"], row["size"], method,
+                                 json.dumps(point, sort_keys=True), *inclusion, *matrix, row["K_eff"], row["G_eff"], row["stress_concentration"]])
+                i += 1
+    console.log(f"[green]Screened {i} points analytically in {time.perf_counter() - start:.3f}s, written to results/analytical.csv[/green]")
+
+def status():
+    summary = telemetry.summarize(results_path / "telemetry.jsonl")
+    if summary is None:
+        console.log("[red]No telemetry yet, start a study first[/red]")
+        return
+    total = summary["total"] if summary["total"] is not None else "?"
+    console.log(f"[green]{summary['mode']} study: {summary['completed']}/{total} cycles, {summary['failed']} failed ({100 * summary['failure_rate']:.1f}%)[/green]")
+    console.log(f"[cyan]Throughput: {summary['cycles_per_hour']:.1f} cycles/h overall, {summary['recent_cycles_per_hour']:.1f} cycles/h recently[/cyan]")
+    console.log(f"[cyan]Workers: {summary['workers']}, utilization {100 * summary['utilization']:.1f}%, {summary['running']} running, {summary['queued']} queued[/cyan]")
+    stages = ", ".join(f"{stage} {seconds:.1f}s" for stage, seconds in summary["stage_means"].items())
+    console.log(f"[cyan]Mean stage time: {stages}[/cyan]")
+    console.log(f"[cyan]Elapsed {telemetry.format_duration(summary['elapsed'])}, ETA {telemetry.format_duration(summary['eta_seconds'])}, last update {telemetry.format_duration(summary['since_update'])} ago[/cyan]")
+
+def update_monitor(monitor, row):
+    if row is None:
+        return False
+    monitor.update(row)
+    for f in monitor.fields:
+        width = monitor.relative_ci_width(f)
+        console.log(f"[cyan]{f}: mean {monitor.moments[f].mean:.4e}, CI width {width:.2f}%[/cyan]")
+    return monitor.converged()
+
 def intro():
     model = "Mutable Circles Count Analysis"
     if fields["control_af"]:
@@ -154,6 +621,31 @@ def main():
         action="store_true",
         help="Generate meshes based on config file."
     )
+    parser.add_argument(
+        "-s", "--sweep",
+        action="store_true",
+        help="Run the parameter sweep described in the config file."
+    )
+    parser.add_argument(
+        "-l", "--active",
+        action="store_true",
+        help="Choose cycle parameters by active learning on a surrogate model."
+    )
+    parser.add_argument(
+        "-r", "--remesh",
+        action="store_true",
+        help="Re-mesh a saved packing at each configured element size."
+    )
+    parser.add_argument(
+        "-a", "--analytical",
+        action="store_true",
+        help="Screen the sweep points with mean-field estimates instead of meshing."
+    )
+    parser.add_argument(
+        "--status",
+        action="store_true",
+        help="Summarize the telemetry of the running or last study."
+    )
     parser.add_argument(
         "-c", "--clear",
         action="store_true",
@@ -165,6 +657,20 @@ def main():
     if args.generate:
         intro()
         genmeshes()
+    elif args.sweep:
+        intro()
+        runsweep()
+    elif args.active:
+        intro()
+        runactive()
+    elif args.remesh:
+        intro()
+        runremesh()
+    elif args.analytical:
+        intro()
+        runanalytical()
+    elif args.status:
+        status()
     elif args.clear:
         os.system(f"rm -rf {records_path}/*")
     else:
@@ -0,0 +1,137 @@
+from scipy.stats import truncnorm
+from functools import lru_cache
+import numpy as np
+import math
+
+# Analytical pre-screen of a design point: no mesh, no solve. The circles are treated as
+# aligned cylindrical fibres in plane strain. In-plane strains split into a volumetric part
+# (plane-strain bulk modulus K = lam + mu) and a deviatoric part (shear modulus G), and
+# each part gets the Eshelby concentration factor of a circular inclusion:
+#   A_K = (K_m + G_m) / (K_i + G_m),   A_G = (G_m + G*) / (G_i + G*),  G* = G_m K_m / (K_m + 2 G_m)
+# Mori-Tanaka embeds one inclusion in the mean matrix strain, the self-consistent scheme
+# embeds every phase in the effective medium. The load is the one of analysis.py: pressure
+# on the top edge with rollers on the bottom, left and right, so the mean strain is
+# uniaxial in y. The inclusion field is uniform, and the matrix stress on the interface
+# follows from traction and tangential strain continuity, which gives vms_max.
+
+PRESSURE = 75.0e6 # Pa, same load as analysis.py
+
+def plane_strain_moduli(E, nu):
+    mu = E / (2.0 * (1.0 + nu))
+    lam = E * nu / ((1.0 + nu) * (1.0 - 2.0 * nu))
+    return lam + mu, mu
+
+def dilute_factors(K_ref, G_ref, K, G):
+    g_star = G_ref * K_ref / (K_ref + 2.0 * G_ref)
+    return (K_ref + G_ref) / (K + G_ref), (G_ref + g_star) / (G + g_star)
+
+def mori_tanaka(c, inclusion, matrix):
+    (K_i, G_i), (K_m, G_m) = inclusion, matrix
+    A_K, A_G = dilute_factors(K_m, G_m, K_i, G_i)
+    # Strain concentration of each phase relative to the mean strain
+    concentration = {
+        "inclusion": (A_K / (c * A_K + 1.0 - c), A_G / (c * A_G + 1.0 - c)),
+        "matrix": (1.0 / (c * A_K + 1.0 - c), 1.0 / (c * A_G + 1.0 - c)),
+    }
+    K = K_m + c * (K_i - K_m) * concentration["inclusion"][0]
+    G = G_m + c * (G_i - G_m) * concentration["inclusion"][1]
+    return K, G, concentration
+
+def self_consistent(c, inclusion, matrix, tol=1e-12, max_iterations=500):
+    (K_i, G_i), (K_m, G_m) = inclusion, matrix
+    K, G = mori_tanaka(c, inclusion, matrix)[:2]
+    for _ in range(max_iterations):
+        A_Ki, A_Gi = dilute_factors(K, G, K_i, G_i)
+        A_Km, A_Gm = dilute_factors(K, G, K_m, G_m)
+        norm_K = c * A_Ki + (1.0 - c) * A_Km
+        norm_G = c * A_Gi + (1.0 - c) * A_Gm
+        K_new = (c * K_i * A_Ki + (1.0 - c) * K_m * A_Km) / norm_K
+        G_new = (c * G_i * A_Gi + (1.0 - c) * G_m * A_Gm) / norm_G
+        converged = abs(K_new - K) <= tol * K and abs(G_new - G) <= tol * G
+        K, G = K_new, G_new
+        if converged:
+            break
+    concentration = {
+        "inclusion": (A_Ki / norm_K, A_Gi / norm_G),
+        "matrix": (A_Km / norm_K, A_Gm / norm_G),
+    }
+    return K, G, concentration
+
+def von_mises(S):
+    # Same 2D expression as analysis.py: sqrt(3/2 dev(S):dev(S)) with dev(S) = S - tr(S)/3 I
+    S = np.asarray(S)
+    trace = S[..., 0, 0] + S[..., 1, 1]
+    dev_dev = np.sum(S * S, axis=(-2, -1)) - 4.0 / 9.0 * trace * trace
+    return np.sqrt(1.5 * np.maximum(dev_dev, 0.0))
+
+def phase_state(K, G, factors, strain):
+    volumetric = np.trace(strain)
+    deviatoric = strain - 0.5 * volumetric * np.eye(2)
+    local = factors[0] * 0.5 * volumetric * np.eye(2) + factors[1] * deviatoric
+    stress = K * np.trace(local) * np.eye(2) + 2.0 * G * (local - 0.5 * np.trace(local) * np.eye(2))
+    return local, stress
+
+def interface_stress(strain, stress, E_m, nu_m, angles):
+    # Matrix side of the interface: traction (nn, nt) carries over from the inclusion and so
+    # does the tangential strain, which fixes the hoop stress through the matrix compliance
+    theta = np.linspace(0.0, math.pi, angles, endpoint=False)
+    n = np.stack([np.cos(theta), np.sin(theta)], axis=-1)
+    t = np.stack([-np.sin(theta), np.cos(theta)], axis=-1)
+    s_nn = np.einsum("ai,ij,aj->a", n, stress, n)
+    s_nt = np.einsum("ai,ij,aj->a", t, stress, n)
+    e_tt = np.einsum("ai,ij,aj->a", t, strain, t)
+    E_plane, nu_plane = E_m / (1.0 - nu_m ** 2), nu_m / (1.0 - nu_m)
+    s_tt = E_plane * e_tt + nu_plane * s_nn
+    return np.stack([np.stack([s_nn, s_nt], axis=-1), np.stack([s_nt, s_tt], axis=-1)], axis=-2)
+
+def mean_square_radius(fields):
+    if not fields["randomized_radius"]:
+        return fields["control_circles_params"]["set_circle_radius"] ** 2
+    return random_mean_square_radius(fields["distribution"], fields["random_params"]["randomized_max_radius"])
+
+@lru_cache(maxsize=None)
+def random_mean_square_radius(distribution, r_max):
+    if distribution == "uniform":
+        return (0.01 + 0.1 * r_max + r_max ** 2) / 3.0
+    # Same truncated normal as MeshGenerator.draw_radius
+    mean, std = (r_max + 0.1) / 2, (r_max - 0.1) / 4
+    a, b = (0.1 - mean) / std, (r_max - mean) / std
+    m, v = truncnorm.stats(a, b, loc=mean, scale=std, moments="mv")
+    return float(v + m * m)
+
+def screen_point(fields, inclusion, matrix, method="mori_tanaka", angles=360):
+    area = float(fields["layout"][0]) * float(fields["layout"][1])
+    r2 = mean_square_radius(fields)
+    if fields["control_af"]:
+        af = fields["af_options"]["const_percentage"]
+        circles = int(round(af / 100.0 * area / (math.pi * r2)))
+    else:
+        circles = fields["control_circles_params"]["circles"]
+        af = 100.0 * circles * math.pi * r2 / area
+    c = min(max(af / 100.0, 0.0), 1.0)
+
+    phases = {"inclusion": plane_strain_moduli(*inclusion), "matrix": plane_strain_moduli(*matrix)}
+    if method == "mori_tanaka":
+        K, G, concentration = mori_tanaka(c, phases["inclusion"], phases["matrix"])
+    elif method == "self_consistent":
+        K, G, concentration = self_consistent(c, phases["inclusion"], phases["matrix"])
+    else:
+        raise ValueError("Unsupported mean-field method.")
+
+    # Rollers on the sides: no mean strain in x, the top pressure sets the stress in y
+    strain = np.array([[0.0, 0.0], [0.0, -PRESSURE / (K + G)]])
+    states = {name: phase_state(*phases[name], concentration[name], strain) for name in phases}
+
+    vms_inclusion = float(von_mises(states["inclusion"][1]))
+    vms_matrix = float(von_mises(states["matrix"][1]))
+    vms_interface = float(np.max(von_mises(interface_stress(*states["inclusion"], matrix[0], matrix[1], angles))))
+    return {
+        "circles": circles,
+        "vms_max": max(vms_inclusion, vms_interface) if c > 0 else vms_matrix,
+        "vms_mean": c * vms_inclusion + (1.0 - c) * vms_matrix,
+        "area_fraction": af,
+        "size": area,
+        "K_eff": K,
+        "G_eff": G,
+        "stress_concentration": vms_interface / vms_matrix if vms_matrix > 0 else float("nan"),
+    }
@@ -0,0 +1,135 @@
+#!/usr/bin/python3
+"""
+Master/worker driver for large studies. Run with:
+    mpirun -np 4 python3 src/mpidriver.py        # cycles from config.json
+    mpirun -np 4 python3 src/mpidriver.py -s     # jobs from sweep_params
+Rank 0 hands out one cycle at a time, every other rank generates and analyzes it locally
+and sends back the result row and timings. With a single rank, rank 0 does the work itself.
+"""
+from mpi4py import MPI
+import argparse
+import json
+import csv
+import time
+import os
+import main
+import sweep
+
+TAG_WORK = 1
+TAG_RESULT = 2
+TAG_STOP = 3
+
+def worker(comm):
+    status = MPI.Status()
+    while True:
+        job = comm.recv(source=0, tag=MPI.ANY_TAG, status=status)
+        if status.Get_tag() == TAG_STOP:
+            break
+        job_id, cycle_fields = job
+        start = time.perf_counter()
+        try:
+            # Rank 0 owns data.csv, the analysis row is kept next to the record instead
+            row, timings = main.run_cycle(
+                job_id, cycle_fields,
+                comm=MPI.COMM_SELF,
+                results_dir=main.records_path / str(job_id),
+                nested=True
+            )
+            payload = main.collect_record(job_id)
+        except Exception as e:
+            # gmsh raises plain exceptions, one bad packing must not take the whole job down
+            main.console.log(f"[red]Cycle {job_id} failed on rank {comm.rank}: {e}[/red]")
+            row, payload = None, None
+            timings = {"generate": time.perf_counter() - start, "analysis": 0.0}
+        comm.send((job_id, row, timings, comm.rank, payload), dest=0, tag=TAG_RESULT)
+
+def master(comm, jobs, total, ramp=False):
+    main.init_results()
+    monitor = main.build_monitor()
+    study_archive = main.open_archive()
+
+    timings_file = open(os.path.join(main.results_path, "timings.csv"), "w", newline="")
+    timings_writer = csv.writer(timings_file)
+    timings_writer.writerow(['id', 'rank', 'generate', 'analysis', 'status'])
+    progress = main.open_telemetry(total, workers=max(comm.size - 1, 1), mode="mpi")
+
+    def record(job_id, row, timings, rank, payload, running=0):
+        if row is not None:
+            main.write_row(row)
+        main.archive_cycle(study_archive, job_id, payload)
+        timings_writer.writerow([job_id, rank, timings["generate"], timings["analysis"], "ok" if row is not None else "failed"])
+        timings_file.flush()
+        progress.record(job_id, timings, ok=row is not None, queued=max(total - progress.completed - running, 0),
+                        running=running, rank=rank)
+        return monitor is not None and main.update_monitor(monitor, row)
+
+    jobs = iter(jobs)
+    converged = False
+
+    if comm.size == 1:
+        ramp_state = {} if ramp else None
+        for job_id, cycle_fields in jobs:
+            row, timings = main.run_cycle(job_id, cycle_fields, comm=MPI.COMM_SELF, results_dir=main.records_path / str(job_id), nested=True, ramp_state=ramp_state)
+            if record(job_id, row, timings, 0, main.collect_record(job_id)):
+                converged = True
+                break
+    else:
+        if ramp:
+            main.console.log("[red]Incremental ramp needs cycles in order, each rank packs from scratch[/red]")
+        outstanding = 0
+        for rank in range(1, comm.size):
+            job = next(jobs, None)
+            if job is None:
+                break
+            comm.send(job, dest=rank, tag=TAG_WORK)
+            outstanding += 1
+
+        status = MPI.Status()
+        while outstanding > 0:
+            job_id, row, timings, rank, payload = comm.recv(source=MPI.ANY_SOURCE, tag=TAG_RESULT, status=status)
+            outstanding -= 1
+            if record(job_id, row, timings, rank, payload, running=outstanding) and not converged:
+                converged = True
+                main.console.log(f"[green]Statistics converged, draining {outstanding} running jobs[/green]")
+            job = None if converged else next(jobs, None)
+            if job is not None:
+                comm.send(job, dest=rank, tag=TAG_WORK)
+                outstanding += 1
+
+        for rank in range(1, comm.size):
+            comm.send(None, dest=rank, tag=TAG_STOP)
+
+    timings_file.close()
+    if study_archive is not None:
+        study_archive.close()
+    if converged:
+        main.console.log("[green]Statistics converged, stopping early[/green]")
+    if monitor is not None:
+        json.dump(monitor.summary(), open(os.path.join(main.results_path, "stats.json"), "w"), indent=4)
+    main.run_model()
+
+def drive():
+    parser = argparse.ArgumentParser(description="OpenMATRIX MPI driver")
+    parser.add_argument(
+        "-s", "--sweep",
+        action="store_true",
+        help="Distribute the parameter sweep instead of the configured cycles."
+    )
+    args = parser.parse_args()
+
+    comm = MPI.COMM_WORLD
+    if comm.rank != 0:
+        worker(comm)
+        return
+
+    main.intro()
+    if args.sweep:
+        jobs = [(job_id, sweep.apply_overrides(main.fields, job)) for job_id, job in main.expand_sweep()]
+        total = len(jobs)
+    else:
+        jobs = main.cycle_jobs()
+        total = main.fields["cycles"]
+    master(comm, jobs, total, ramp=not args.sweep and main.incremental_ramp())
+
+if __name__ == "__main__":
+    drive()
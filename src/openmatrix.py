@@ -1,10 +1,17 @@
 #!/usr/bin/python3
 from mpi4py import MPI
-from dolfinx.io import gmshio, XDMFFile
+from dolfinx.io import gmshio, XDMFFile, distribute_entity_data
+from dolfinx.mesh import CellType, create_mesh, locate_entities_boundary, meshtags, meshtags_from_entities
+from dolfinx.graph import adjacencylist
+from dolfinx import default_real_type
 from scipy.stats import truncnorm
+from scipy.spatial import cKDTree
 from rich.progress import Progress
 from rich.console import Console
+from geometry import build_direct_geometry
+import tiling
 import gmsh
+import numpy as np
 import random
 import math
 import json
@@ -15,7 +22,11 @@ console = Console()
 
 class MeshGenerator:
     def __init__(self, layout, size, circles, randomized_max_radius, circ_distribution_type,
-                 set_circle_radius, mesh_element_size, randomized_radius, min_fraction_inside=0, circ_af=None):
+                 set_circle_radius, mesh_element_size, randomized_radius, min_fraction_inside=0, circ_af=None, comm=None,
+                 min_gap=0.0, max_elements=None, max_regenerations=5, save_packing=False,
+                 element_order=1, curved_geometry=False, geometry_builder="occ", tiles=None, tile_workers=None,
+                 mesh_algorithm=None, mesh_smoothing=None, placement="random", max_radius_tries=500,
+                 af_targeting="rollback", undershoot_percentage=1.0):
         self.layout = layout
         self.layout_x = float(layout[0])
         self.layout_y = float(layout[1])
@@ -33,10 +44,45 @@ class MeshGenerator:
         self.use_ratio = circ_af[0]
         self.percentage = circ_af[1]
         self.error_bound = circ_af[2]
+        self.comm = comm if comm is not None else MPI.COMM_WORLD
+        self.min_gap = min_gap
+        self.max_elements = max_elements
+        self.max_regenerations = max_regenerations
+        self.placed_count = 0
+        self.primary_circles = []
+        self.base_circles = []
+        self.packed = False
+        self.export_packing = save_packing
+        self.element_order = element_order
+        # Second order geometry puts the mid-edge nodes on the circle arcs instead of the chords
+        self.geometry_order = 2 if curved_geometry and element_order >= 2 else 1
+        self.geometry_builder = geometry_builder
+        self.tiles = tiles
+        self.tile_workers = tile_workers
+        self.mesh_algorithm = mesh_algorithm
+        self.mesh_smoothing = mesh_smoothing
+        self.placement = placement
+        self.max_radius_tries = max_radius_tries
+        self.af_targeting = af_targeting
+        self.undershoot = undershoot_percentage
+        self.radius_queue = []
+        self.radius_tries = 0
+        self.rejected = 0
 
     def check_circ_overlap(self, x1, y1, r1, x2, y2, r2) -> bool:
         d = math.sqrt((x2 - x1)**2 + (y2 - y1)**2)
-        return d < (r1 + r2)
+        return d < (r1 + r2 + self.min_gap)
+
+    def clears_edges(self, cx, cy, radius):
+        # A circle that ends just inside or just outside an edge leaves a sliver as thin
+        # as the ligament between two circles, so the same minimum width applies. Called
+        # for every periodic image, which covers circles centred outside that barely enter.
+        if self.min_gap <= 0:
+            return True
+        return all(abs(d) >= self.min_gap for d in (
+            cx - radius, self.layout_x - cx - radius,
+            cy - radius, self.layout_y - cy - radius
+        ))
 
     def is_enough_inside(self, cx, cy, radius):
         x_min = cx - radius
@@ -65,25 +111,137 @@ class MeshGenerator:
         a, b = (rmin - rmean) / rstd, (rmax - rmean) / rstd
         return truncnorm.rvs(a, b, loc=rmean, scale=rstd)
 
-    def generate_from_af(self, visualize=True, save_path=None):
-        comm = MPI.COMM_WORLD
-        rank = comm.rank
-
-        gmsh.initialize()
-        gmsh.model.add("Mesh Result")
-        gmsh.option.setNumber("Mesh.CharacteristicLengthMax", self.mesh_element_size)
-        gmsh.option.setNumber("General.Terminal", 0)
-
-        rect, rect_edges = self.create_rect()
-        circle_tags = []
+    def draw_radius(self):
+        if not self.randomized_radius:
+            return self.set_circle_radius
+        if self.circ_distribution_type == "uniform":
+            return random.uniform(0.1, self.randomized_max_radius)
+        elif self.circ_distribution_type == "gaussian":
+            return self.truncated_gaussian(
+                rmin=0.1,
+                rmax=self.randomized_max_radius,
+                rmean=(self.randomized_max_radius + 0.1) / 2,
+                rstd=(self.randomized_max_radius - 0.1) / 4
+            )
+        else:
+            raise ValueError("Unsupported distribution type.")
+
+    def presort_radii(self):
+        # Largest-first: draw the whole population up front and place it in descending order,
+        # big circles go in while there is still room for them
+        self.radius_queue = []
+        self.radius_tries = 0
+        if self.placement != "largest_first":
+            return
+        if self.use_ratio:
+            target = self.percentage / 100.0 * self.square_area_sum
+            area = self.circle_area_sum
+            while area < target:
+                r = self.draw_radius()
+                self.radius_queue.append(r)
+                area += math.pi * r * r
+        else:
+            self.radius_queue = [self.draw_radius() for _ in range(max(self.circles - self.placed_count, 0))]
+        self.radius_queue.sort()
+
+    def next_radius(self):
+        if self.radius_queue:
+            self.radius_tries += 1
+            if self.radius_tries > self.max_radius_tries:
+                # No room left for this size, it is replaced by a fresh draw once the queue is empty
+                self.radius_queue.pop()
+                self.radius_tries = 1
+        if self.radius_queue:
+            return self.radius_queue[-1]
+        return self.draw_radius()
+
+    def radius_used(self):
+        if self.radius_queue:
+            self.radius_queue.pop()
+        self.radius_tries = 0
+
+    def periodic_images(self, cx, cy, circle_radius):
+        potential_positions = [(cx, cy)]
+
+        if cx - circle_radius < 0:
+            potential_positions.append((cx + self.layout_x, cy))
+        if cx + circle_radius > self.layout_x:
+            potential_positions.append((cx - self.layout_x, cy))
+        if cy - circle_radius < 0:
+            potential_positions.append((cx, cy + self.layout_y))
+        if cy + circle_radius > self.layout_y:
+            potential_positions.append((cx, cy - self.layout_y))
+
+        if cx - circle_radius < 0 and cy - circle_radius < 0:
+            potential_positions.append((cx + self.layout_x, cy + self.layout_y))
+        if cx + circle_radius > self.layout_x and cy - circle_radius < 0:
+            potential_positions.append((cx - self.layout_x, cy + self.layout_y))
+        if cx - circle_radius < 0 and cy + circle_radius > self.layout_y:
+            potential_positions.append((cx + self.layout_x, cy - self.layout_y))
+        if cx + circle_radius > self.layout_x and cy + circle_radius > self.layout_y:
+            potential_positions.append((cx - self.layout_x, cy - self.layout_y))
+
+        return potential_positions
+
+    def is_valid_placement(self, potential_positions, circle_radius):
+        cx, cy = potential_positions[0]
+        return all(
+            not self.check_circ_overlap(px, py, circle_radius, x, y, r)
+            for px, py in potential_positions
+            for x, y, r in self.placed_circles
+        ) and self.is_enough_inside(cx, cy, circle_radius) and all(
+            self.clears_edges(px, py, circle_radius) for px, py in potential_positions
+        )
+
+    def commit_circle(self, potential_positions, circle_radius):
+        for px, py in potential_positions:
+            self.placed_circles.append((px, py, circle_radius))
+        self.primary_circles.append((potential_positions[0][0], potential_positions[0][1], circle_radius))
+        self.circle_area_sum += math.pi * circle_radius ** 2
+        self.placed_count += 1
+
+    def rollback_circle(self, potential_positions, circle_radius):
+        for _ in potential_positions:
+            self.placed_circles.pop()
+        self.primary_circles.pop()
+        self.circle_area_sum -= math.pi * circle_radius ** 2
+        self.placed_count -= 1
+
+    def reset_packing(self):
+        self.placed_circles = []
+        self.primary_circles = []
+        self.circle_area_sum = 0.0
+        self.placed_count = 0
 
-        placed_count = 0
+    def seed_packing(self, circles, layout):
+        # Incremental ramps: later packs keep these circles and only place the missing ones.
+        # The previous packing is unusable if the domain changed or it already overshoots.
+        if [float(v) for v in layout] != [self.layout_x, self.layout_y]:
+            return False
+        if self.use_ratio:
+            area = sum(math.pi * r * r for _, _, r in circles)
+            if area > (self.percentage + self.error_bound) / 100.0 * self.square_area_sum:
+                return False
+        elif len(circles) > self.circles:
+            return False
+        self.base_circles = [tuple(float(v) for v in c) for c in circles]
+        return True
+
+    def pack_from_af(self):
         max_attempts = 10000
         attempts = 0
 
         target_ratio = self.percentage
         lower_bound = (target_ratio - self.error_bound) / 100.0 * self.square_area_sum
         upper_bound = (target_ratio + self.error_bound) / 100.0 * self.square_area_sum
+        if self.af_targeting == "rescale":
+            # Stay under the target while placing, rescale_to_target closes the gap exactly
+            lower_bound = (target_ratio - self.undershoot) / 100.0 * self.square_area_sum
+            upper_bound = target_ratio / 100.0 * self.square_area_sum
+
+        if not self.randomized_radius:
+            raise ValueError("Must have randomized radius enabled. Unrandomized is only for set circles")
+        self.presort_radii()
 
         with Progress() as progress:
             task = progress.add_task(
@@ -91,7 +249,8 @@ class MeshGenerator:
                 total=upper_bound,
             )
             while True:
-                if lower_bound <= self.circle_area_sum <= upper_bound:
+                # A presorted population is placed completely, down to its smallest circles
+                if lower_bound <= self.circle_area_sum <= upper_bound and not self.radius_queue:
                     break
                 if attempts > max_attempts:
                     console.log(f"[red]Max attempts ({max_attempts}) exhausted.[/red]")
@@ -100,72 +259,227 @@ class MeshGenerator:
 
                 valid_placement = False
                 while not valid_placement:
-                    if self.randomized_radius:
-                        if self.circ_distribution_type == "uniform":
-                            circle_radius = random.uniform(0.1, self.randomized_max_radius)
-                        elif self.circ_distribution_type == "gaussian":
-                            circle_radius = self.truncated_gaussian(
-                                rmin=0.1,
-                                rmax=self.randomized_max_radius,
-                                rmean=(self.randomized_max_radius + 0.1) / 2,
-                                rstd=(self.randomized_max_radius - 0.1) / 4
-                            )
-                        else:
-                            raise ValueError("Unsupported distribution type.")
-                    else:
-                        raise ValueError("Must have randomized radius enabled. Unrandomized is only for set circles")
+                    circle_radius = self.next_radius()
 
                     cx = random.uniform(-circle_radius, self.layout_x + circle_radius)
                     cy = random.uniform(-circle_radius, self.layout_y + circle_radius)
 
-                    potential_positions = [(cx, cy)]
-
-                    if cx - circle_radius < 0:
-                        potential_positions.append((cx + self.layout_x, cy))
-                    if cx + circle_radius > self.layout_x:
-                        potential_positions.append((cx - self.layout_x, cy))
-                    if cy - circle_radius < 0:
-                        potential_positions.append((cx, cy + self.layout_y))
-                    if cy + circle_radius > self.layout_y:
-                        potential_positions.append((cx, cy - self.layout_y))
-
-                    if cx - circle_radius < 0 and cy - circle_radius < 0:
-                        potential_positions.append((cx + self.layout_x, cy + self.layout_y))
-                    if cx + circle_radius > self.layout_x and cy - circle_radius < 0:
-                        potential_positions.append((cx - self.layout_x, cy + self.layout_y))
-                    if cx - circle_radius < 0 and cy + circle_radius > self.layout_y:
-                        potential_positions.append((cx + self.layout_x, cy - self.layout_y))
-                    if cx + circle_radius > self.layout_x and cy + circle_radius > self.layout_y:
-                        potential_positions.append((cx - self.layout_x, cy - self.layout_y))
-
-                    valid_placement = all(
-                        not self.check_circ_overlap(px, py, circle_radius, x, y, r)
-                        for px, py in potential_positions
-                        for x, y, r in self.placed_circles
-                    ) and self.is_enough_inside(cx, cy, circle_radius)
-
-                new_area = math.pi * circle_radius ** 2
-                
-                self.placed_circles.append((cx, cy, circle_radius))
-                circle_tags.append(self.add_circle(cx, cy, circle_radius))
-                
-                for px, py in potential_positions[1:]:
-                    self.placed_circles.append((px, py, circle_radius))
-                    circle_tags.append(self.add_circle(px, py, circle_radius))
-                
-                self.circle_area_sum += new_area
-                placed_count += 1
+                    potential_positions = self.periodic_images(cx, cy, circle_radius)
+                    valid_placement = self.is_valid_placement(potential_positions, circle_radius)
+                    if not valid_placement:
+                        self.rejected += 1
+
+                self.commit_circle(potential_positions, circle_radius)
+                self.radius_used()
 
                 if self.circle_area_sum > upper_bound:
-                    for _ in potential_positions:
-                        self.placed_circles.pop()
-                        tag = circle_tags.pop()
-                        gmsh.model.occ.remove([(2, tag)], recursive=True)
-                    self.circle_area_sum -= new_area
-                    placed_count -= 1
+                    self.rollback_circle(potential_positions, circle_radius)
                 else:
                     progress.update(task, completed=self.circle_area_sum)
 
+        if self.af_targeting == "rescale":
+            self.rescale_to_target(target_ratio / 100.0 * self.square_area_sum)
+
+    def scaled_circles(self, radii):
+        circles, owners = [], []
+        for k, ((cx, cy, _), r) in enumerate(zip(self.primary_circles, radii)):
+            for px, py in self.periodic_images(cx, cy, r):
+                circles.append((px, py, r))
+                owners.append(k)
+        return np.array(circles, dtype=float), np.array(owners)
+
+    def radii_valid(self, radii):
+        # Same rules as is_valid_placement for every circle at once, periodic copies rebuilt
+        # for the new radii since a grown circle can start crossing an edge
+        radii = np.asarray(radii, dtype=float)
+        if self.randomized_radius and np.any(radii > self.randomized_max_radius):
+            return False
+        centers = np.array(self.primary_circles, dtype=float)[:, :2]
+        cx, cy = centers[:, 0], centers[:, 1]
+
+        x_overlap = np.maximum(0, np.minimum(cx + radii, self.layout_x) - np.maximum(cx - radii, 0))
+        y_overlap = np.maximum(0, np.minimum(cy + radii, self.layout_y) - np.maximum(cy - radii, 0))
+        if np.any(x_overlap * y_overlap / (math.pi * radii * radii) < self.min_fraction_inside):
+            return False
+        circles, owners = self.scaled_circles(radii)
+        if self.min_gap > 0:
+            px, py, pr = circles.T
+            edges = np.abs(np.stack([px - pr, self.layout_x - px - pr, py - pr, self.layout_y - py - pr]))
+            if np.any(edges < self.min_gap):
+                return False
+
+        pairs = cKDTree(circles[:, :2]).query_pairs(2 * radii.max() + self.min_gap, output_type="ndarray")
+        if len(pairs) == 0:
+            return True
+        pairs = pairs[owners[pairs[:, 0]] != owners[pairs[:, 1]]]
+        d = np.hypot(*(circles[pairs[:, 0], :2] - circles[pairs[:, 1], :2]).T)
+        return not np.any(d < circles[pairs[:, 0], 2] + circles[pairs[:, 1], 2] + self.min_gap)
+
+    def largest_valid(self, candidate, lo, hi, iterations=40):
+        # Bisection on a scalar that grows the radii, lo is known to be valid
+        if self.radii_valid(candidate(hi)):
+            return hi
+        for _ in range(iterations):
+            mid = 0.5 * (lo + hi)
+            if self.radii_valid(candidate(mid)):
+                lo = mid
+            else:
+                hi = mid
+        return lo
+
+    def rescale_to_target(self, target_area):
+        if not self.primary_circles or self.circle_area_sum >= target_area:
+            return
+        radii = np.array([r for _, _, r in self.primary_circles], dtype=float)
+
+        # One global factor first, then single circles make up what contacts prevented
+        scale = self.largest_valid(lambda s: radii * s, 1.0, math.sqrt(target_area / self.circle_area_sum))
+        radii = radii * scale
+        missing = target_area - math.pi * np.sum(radii * radii)
+        for k in np.argsort(radii):
+            if missing <= 1e-12 * target_area:
+                break
+            wanted = math.sqrt(radii[k] ** 2 + missing / math.pi)
+
+            def grown(r, k=k):
+                trial = radii.copy()
+                trial[k] = r
+                return trial
+
+            new_radius = self.largest_valid(grown, radii[k], wanted)
+            missing -= math.pi * (new_radius ** 2 - radii[k] ** 2)
+            radii[k] = new_radius
+
+        centers = [(cx, cy) for cx, cy, _ in self.primary_circles]
+        self.reset_packing()
+        for (cx, cy), r in zip(centers, radii):
+            self.commit_circle(self.periodic_images(cx, cy, float(r)), float(r))
+        console.log(f"[green]Rescaled radii by {scale:.4f} to {100 * self.circle_area_sum / self.square_area_sum:.4f}% "
+                    f"(target {100 * target_area / self.square_area_sum:.4f}%)[/green]")
+
+    def pack_from_circles(self):
+        max_attempts = 10000
+        attempts = 0
+
+        target_ratio = self.percentage
+        lower_bound = (target_ratio - self.error_bound) / 100.0 * self.square_area_sum
+        upper_bound = (target_ratio + self.error_bound) / 100.0 * self.square_area_sum
+        self.presort_radii()
+
+        while True:
+            if not self.use_ratio and self.placed_count >= self.circles:
+                break
+            if self.use_ratio and lower_bound <= self.circle_area_sum <= upper_bound and not self.radius_queue:
+                break
+            if attempts > max_attempts:
+                console.log(f"[red]Max attempts ({max_attempts}) exhausted.[/red]")
+                break
+            attempts += 1
+
+            valid_placement = False
+            while not valid_placement:
+                circle_radius = self.next_radius()
+
+                cx = random.uniform(-self.randomized_max_radius * 1.5, self.layout_x + self.randomized_max_radius * 1.5)
+                cy = random.uniform(-self.randomized_max_radius * 1.5, self.layout_y + self.randomized_max_radius * 1.5)
+
+                potential_positions = self.periodic_images(cx, cy, circle_radius)
+                valid_placement = self.is_valid_placement(potential_positions, circle_radius)
+                if not valid_placement:
+                    self.rejected += 1
+
+            self.commit_circle(potential_positions, circle_radius)
+            self.radius_used()
+
+            if self.use_ratio and self.circle_area_sum > upper_bound:
+                self.rollback_circle(potential_positions, circle_radius)
+
+    def estimate_mesh_size(self):
+        # Bulk: the domain filled with equilateral triangles of edge mesh_element_size.
+        # Ligaments: where two circles (or a circle and an edge) come closer than h, the local
+        # element size follows the gap s(x) ~ g + x^2 / (2 R) across the neck, which adds
+        # about (4 / sqrt(3)) * integral(dx / s(x)) elements per neck.
+        h = self.mesh_element_size
+        elements = self.square_area_sum / (math.sqrt(3) / 4 * h * h)
+
+        def neck_elements(gap, r_eff):
+            gap = max(gap, 1e-9)
+            half_length = math.sqrt(2 * r_eff * max(h - gap, 0.0))
+            scale = math.sqrt(2 * r_eff * gap)
+            return 4 / math.sqrt(3) * 2 * math.sqrt(2 * r_eff / gap) * math.atan(half_length / scale)
+
+        if self.placed_circles:
+            circles = np.array(self.placed_circles)
+            centers, radii = circles[:, :2], circles[:, 2]
+            tree = cKDTree(centers)
+            for i, j in tree.query_pairs(2 * radii.max() + h):
+                gap = math.dist(centers[i], centers[j]) - radii[i] - radii[j]
+                if 0 <= gap < h:
+                    elements += neck_elements(gap, radii[i] * radii[j] / (radii[i] + radii[j]))
+            for (cx, cy), r in zip(centers, radii):
+                for gap in (cx - r, self.layout_x - cx - r, cy - r, self.layout_y - cy - r):
+                    if 0 <= gap < h:
+                        elements += neck_elements(gap, r)
+
+        # About half as many vertices as triangles and 1.5 edges per triangle, so P1 has
+        # elements / 2 nodes and P2 (one extra node per edge) about 2 * elements nodes
+        nodes = elements / 2 if self.element_order == 1 else 2 * elements
+        return int(elements), int(2 * nodes)
+
+    def pack(self, pack_method):
+        for attempt in range(self.max_regenerations + 1):
+            self.reset_packing()
+            for cx, cy, r in self.base_circles:
+                self.commit_circle(self.periodic_images(cx, cy, r), r)
+            self.rejected = 0
+            pack_method()
+            console.log(f"[green]Placed {self.placed_count} circles ({self.rejected} rejected positions)[/green]")
+            if self.max_elements is None:
+                return
+            elements, dofs = self.estimate_mesh_size()
+            if elements <= self.max_elements:
+                console.log(f"[green]Estimated {elements} elements, {dofs} dofs[/green]")
+                return
+            console.log(f"[red]Packing {attempt} estimated at {elements} elements (budget {self.max_elements}), regenerating[/red]")
+        raise RuntimeError(f"No packing within the element budget after {self.max_regenerations + 1} attempts")
+
+    def save_packing(self, path):
+        # Only the circles themselves are stored, periodic copies are rebuilt on load
+        circles = np.array(self.primary_circles, dtype=float).reshape(-1, 3)
+        np.savez_compressed(
+            path,
+            centers=circles[:, :2],
+            radii=circles[:, 2],
+            layout=np.array([self.layout_x, self.layout_y]),
+            area_fraction=(self.circle_area_sum / self.square_area_sum) * 100,
+            use_ratio=self.use_ratio,
+            min_fraction_inside=self.min_fraction_inside,
+            min_gap=self.min_gap
+        )
+
+    def load_packing(self, path):
+        packing = np.load(path)
+        self.layout = [float(v) for v in packing["layout"]]
+        self.layout_x, self.layout_y = self.layout
+        self.square_area_sum = self.layout_x * self.layout_y
+        self.use_ratio = bool(packing["use_ratio"])
+
+        self.reset_packing()
+        for (cx, cy), r in zip(packing["centers"], packing["radii"]):
+            self.commit_circle(self.periodic_images(float(cx), float(cy), float(r)), float(r))
+        self.packed = True
+
+    def generate_packing(self):
+        self.pack(self.pack_from_af if self.use_ratio else self.pack_from_circles)
+        self.packed = True
+
+    def add_packed_circles(self):
+        return [self.add_circle(cx, cy, r) for cx, cy, r in self.placed_circles]
+
+    def fragment_af(self):
+        rect, rect_edges = self.create_rect()
+        circle_tags = self.add_packed_circles()
+
         gmsh.model.occ.synchronize()
 
         valid_circle_tags = []
@@ -237,6 +551,119 @@ class MeshGenerator:
             elif abs(y - self.layout_y) < tol:
                 top.append(tag)
 
+        return circle_surfaces, background_surfaces, bottom, right, top, left
+
+    def fragment_circles(self):
+        rect, rect_edges = self.create_rect()
+        circle_tags = self.add_packed_circles()
+
+        console.log(f"[green]Placed {self.placed_count} circles with tags: {circle_tags}[/green]")
+        gmsh.model.occ.synchronize()
+
+        status, fragments = gmsh.model.occ.fragment([(2, rect)], [(2, tag) for tag in circle_tags])
+        gmsh.model.occ.synchronize()
+
+        all_surfaces = gmsh.model.getEntities(dim=2)
+        to_remove = []
+        for dim, tag in all_surfaces:
+            try:
+                cx, cy, _ = gmsh.model.occ.getCenterOfMass(2, tag)
+                if not (0 <= cx <= self.layout_x and 0 <= cy <= self.layout_y):
+                    to_remove.append((dim, tag))
+            except Exception:
+                continue
+        for ent in to_remove:
+            gmsh.model.occ.remove([ent], recursive=True)
+        gmsh.model.occ.synchronize()
+
+        all_surfaces = gmsh.model.getEntities(dim=2)
+        circle_surfaces = []
+        for dim, tag in all_surfaces:
+            if tag in circle_tags:
+                circle_surfaces.append(tag)
+            else:
+                try:
+                    cx, cy, _ = gmsh.model.occ.getCenterOfMass(2, tag)
+                    for pcx, pcy, r in self.placed_circles:
+                        dist = math.hypot(cx - pcx, cy - pcy)
+                        if dist < r + 1e-6:
+                            circle_surfaces.append(tag)
+                            break
+                except Exception:
+                    continue
+
+        circle_surfaces = list(set(circle_surfaces))
+        background_surfaces = [s[1] for s in all_surfaces if s[1] not in circle_surfaces]
+
+        console.log(f"[green]Circle surfaces after fragmentation: {circle_surfaces}[/green]")
+        console.log(f"[green]Background surfaces: {background_surfaces}[/green]")
+
+        all_edges = gmsh.model.getEntities(dim=1)
+
+        def midpoint(tag):
+            x, y, _ = gmsh.model.occ.getCenterOfMass(1, tag)
+            return x, y
+
+        tol = 1e-6
+        left, right, bottom, top = [], [], [], []
+
+        for dim, tag in all_edges:
+            x, y = midpoint(tag)
+            if abs(x - 0) < tol:
+                left.append(tag)
+            elif abs(x - self.layout_x) < tol:
+                right.append(tag)
+            elif abs(y - 0) < tol:
+                bottom.append(tag)
+            elif abs(y - self.layout_y) < tol:
+                top.append(tag)
+
+        return circle_surfaces, background_surfaces, bottom, right, top, left
+
+    def build_geometry(self):
+        geometry = None
+        if self.geometry_builder == "direct":
+            geometry = build_direct_geometry(self.placed_circles, 0.0, 0.0, self.layout_x, self.layout_y, self.mesh_element_size)
+            if geometry is None:
+                console.log("[red]Packing needs boolean operations, falling back to OCC fragment[/red]")
+
+        if geometry is None:
+            return self.fragment_af() if self.use_ratio else self.fragment_circles()
+        console.log(f"[green]Built {len(geometry['circles'])} circle surfaces without boolean operations[/green]")
+        return (geometry["circles"], geometry["background"],
+                geometry["bottom"], geometry["right"], geometry["top"], geometry["left"])
+
+    def mesh_options(self, default_algorithm=None):
+        # Tuned settings from autotune.py win over the generator's built-in choice
+        options = {}
+        algorithm = self.mesh_algorithm if self.mesh_algorithm is not None else default_algorithm
+        if algorithm is not None:
+            options["Mesh.Algorithm"] = algorithm
+        if self.mesh_smoothing is not None:
+            options["Mesh.Smoothing"] = self.mesh_smoothing
+        return options
+
+    def apply_mesh_options(self, default_algorithm=None):
+        for name, value in self.mesh_options(default_algorithm).items():
+            gmsh.option.setNumber(name, value)
+
+    def generate_from_af(self, visualize=True, save_path=None):
+        comm = self.comm
+        rank = comm.rank
+
+        gmsh.initialize()
+        gmsh.model.add("Mesh Result")
+        gmsh.option.setNumber("Mesh.CharacteristicLengthMax", self.mesh_element_size)
+        gmsh.option.setNumber("General.Terminal", 0)
+        self.apply_mesh_options()
+        if self.geometry_order > 1:
+            gmsh.option.setNumber("Mesh.ElementOrder", self.geometry_order)
+
+        if not self.packed:
+            self.pack(self.pack_from_af)
+
+        circle_surfaces, background_surfaces, bottom, right, top, left = self.build_geometry()
+
         gmsh.model.addPhysicalGroup(1, bottom, tag=1)
         gmsh.model.setPhysicalName(1, 1, "Bottom")
         gmsh.model.addPhysicalGroup(1, right, tag=2)
@@ -282,7 +709,7 @@ class MeshGenerator:
 
         data = {
             "id": n,
-            "circles": placed_count,
+            "circles": self.placed_count,
             "area_fraction": frac,
             "size": size
         }
@@ -291,6 +718,9 @@ class MeshGenerator:
         json_path = os.path.join(save_dir, "meshinfo.json")
         json.dump(data, open(json_path, "w"))
 
+        if self.export_packing:
+            self.save_packing(os.path.join(save_dir, f"packing{n}.npz"))
+
         if visualize:
             try:
                 gmsh.fltk.run()
@@ -300,164 +730,22 @@ class MeshGenerator:
         gmsh.finalize()
 
     def generate_from_circles(self, visualize=True, save_path=None):
-        comm = MPI.COMM_WORLD
+        comm = self.comm
         rank = comm.rank
 
         gmsh.initialize()
         gmsh.model.add("Mesh Result")
         gmsh.option.setNumber("Mesh.CharacteristicLengthMax", self.mesh_element_size)
-        gmsh.option.setNumber("Mesh.Algorithm", 6)
-        gmsh.option.setNumber("Mesh.ElementOrder", 1)
+        self.apply_mesh_options(default_algorithm=6)
+        gmsh.option.setNumber("Mesh.ElementOrder", self.geometry_order)
         gmsh.option.setNumber("Mesh.SaveAll", 0)
         gmsh.option.setNumber("Mesh.SurfaceFaces", 1)
         gmsh.option.setNumber("General.Terminal", 0)
 
-        rect, rect_edges = self.create_rect()
-        circle_tags = []
-
-        placed_count = 0
-        max_attempts = 10000
-        attempts = 0
-
-        target_ratio = self.percentage
-        lower_bound = (target_ratio - self.error_bound) / 100.0 * self.square_area_sum
-        upper_bound = (target_ratio + self.error_bound) / 100.0 * self.square_area_sum
-
-        while True:
-            if not self.use_ratio and placed_count >= self.circles:
-                break
-            if self.use_ratio and lower_bound <= self.circle_area_sum <= upper_bound:
-                break
-            if attempts > max_attempts:
-                console.log(f"[red]Max attempts ({max_attempts}) exhausted.[/red]")
-                break
-            attempts += 1
-
-            valid_placement = False
-            while not valid_placement:
-                if self.randomized_radius:
-                    if self.circ_distribution_type == "uniform":
-                        circle_radius = random.uniform(0.1, self.randomized_max_radius)
-                    elif self.circ_distribution_type == "gaussian":
-                        circle_radius = self.truncated_gaussian(
-                            rmin=0.1,
-                            rmax=self.randomized_max_radius,
-                            rmean=(self.randomized_max_radius + 0.1) / 2,
-                            rstd=(self.randomized_max_radius - 0.1) / 4
-                        )
-                    else:
-                        raise ValueError("Unsupported distribution type.")
-                else:
-                    circle_radius = self.set_circle_radius
-
-                cx = random.uniform(-self.randomized_max_radius * 1.5, self.layout_x + self.randomized_max_radius * 1.5)
-                cy = random.uniform(-self.randomized_max_radius * 1.5, self.layout_y + self.randomized_max_radius * 1.5)
-
-                potential_positions = [(cx, cy)]
-
-                if cx - circle_radius < 0:
-                    potential_positions.append((cx + self.layout_x, cy))
-                if cx + circle_radius > self.layout_x:
-                    potential_positions.append((cx - self.layout_x, cy))
-                if cy - circle_radius < 0:
-                    potential_positions.append((cx, cy + self.layout_y))
-                if cy + circle_radius > self.layout_y:
-                    potential_positions.append((cx, cy - self.layout_y))
-
-                if cx - circle_radius < 0 and cy - circle_radius < 0:
-                    potential_positions.append((cx + self.layout_x, cy + self.layout_y))
-                if cx + circle_radius > self.layout_x and cy - circle_radius < 0:
-                    potential_positions.append((cx - self.layout_x, cy + self.layout_y))
-                if cx - circle_radius < 0 and cy + circle_radius > self.layout_y:
-                    potential_positions.append((cx + self.layout_x, cy - self.layout_y))
-                if cx + circle_radius > self.layout_x and cy + circle_radius > self.layout_y:
-                    potential_positions.append((cx - self.layout_x, cy - self.layout_y))
-
-                valid_placement = all(
-                    not self.check_circ_overlap(px, py, circle_radius, x, y, r)
-                    for px, py in potential_positions
-                    for x, y, r in self.placed_circles
-                ) and self.is_enough_inside(cx, cy, circle_radius)
-
-            new_area = math.pi * circle_radius ** 2
-            self.placed_circles.append((cx, cy, circle_radius))
-            circle = gmsh.model.occ.addDisk(cx, cy, 0, circle_radius, circle_radius)
-            circle_tags.append(circle)
-            for px, py in potential_positions[1:]:
-                self.placed_circles.append((px, py, circle_radius))
-                circle = gmsh.model.occ.addDisk(px, py, 0, circle_radius, circle_radius)
-                circle_tags.append(circle)
-            self.circle_area_sum += new_area
-            placed_count += 1
-
-            if self.use_ratio and self.circle_area_sum > upper_bound:
-                for _ in potential_positions:
-                    self.placed_circles.pop()
-                    tag = circle_tags.pop()
-                    gmsh.model.occ.remove([(2, tag)], recursive=True)
-                self.circle_area_sum -= new_area
-                placed_count -= 1
-
-        console.log(f"[green]Placed {placed_count} circles with tags: {circle_tags}[/green]")
-        gmsh.model.occ.synchronize()
-
-        status, fragments = gmsh.model.occ.fragment([(2, rect)], [(2, tag) for tag in circle_tags])
-        gmsh.model.occ.synchronize()
-
-        all_surfaces = gmsh.model.getEntities(dim=2)
-        to_remove = []
-        for dim, tag in all_surfaces:
-            try:
-                cx, cy, _ = gmsh.model.occ.getCenterOfMass(2, tag)
-                if not (0 <= cx <= self.layout_x and 0 <= cy <= self.layout_y):
-                    to_remove.append((dim, tag))
-            except Exception:
-                continue
-        for ent in to_remove:
-            gmsh.model.occ.remove([ent], recursive=True)
-        gmsh.model.occ.synchronize()
-
-        all_surfaces = gmsh.model.getEntities(dim=2)
-        circle_surfaces = []
-        for dim, tag in all_surfaces:
-            if tag in circle_tags:
-                circle_surfaces.append(tag)
-            else:
-                try:
-                    cx, cy, _ = gmsh.model.occ.getCenterOfMass(2, tag)
-                    for pcx, pcy, r in self.placed_circles:
-                        dist = math.hypot(cx - pcx, cy - pcy)
-                        if dist < r + 1e-6:
-                            circle_surfaces.append(tag)
-                            break
-                except Exception:
-                    continue
-
-        circle_surfaces = list(set(circle_surfaces))
-        background_surfaces = [s[1] for s in all_surfaces if s[1] not in circle_surfaces]
-
-        console.log(f"[green]Circle surfaces after fragmentation: {circle_surfaces}[/green]")
-        console.log(f"[green]Background surfaces: {background_surfaces}[/green]")
-
-        all_edges = gmsh.model.getEntities(dim=1)
+        if not self.packed:
+            self.pack(self.pack_from_circles)
 
-        def midpoint(tag):
-            x, y, _ = gmsh.model.occ.getCenterOfMass(1, tag)
-            return x, y
-
-        tol = 1e-6
-        left, right, bottom, top = [], [], [], []
-
-        for dim, tag in all_edges:
-            x, y = midpoint(tag)
-            if abs(x - 0) < tol:
-                left.append(tag)
-            elif abs(x - self.layout_x) < tol:
-                right.append(tag)
-            elif abs(y - 0) < tol:
-                bottom.append(tag)
-            elif abs(y - self.layout_y) < tol:
-                top.append(tag)
+        circle_surfaces, background_surfaces, bottom, right, top, left = self.build_geometry()
 
         gmsh.model.addPhysicalGroup(1, bottom, tag=1)
         gmsh.model.setPhysicalName(1, 1, "Bottom")
@@ -492,15 +780,16 @@ class MeshGenerator:
         frac = (self.circle_area_sum / self.square_area_sum) * 100
         size = self.layout_x * self.layout_y
 
-        match = re.search(r'mesh(\d+)\.xdmf$', save_path)
+        match = re.search(r'mesh(\d+)\.xdmf$', str(save_path))
         if match:
             n = int(match.group(1))
         else:
             console.log("[red]No match found.[/red]")
+            n = 0
 
         data = {
             "id": n,
-            "circles": placed_count,
+            "circles": self.placed_count,
             "area_fraction": frac,
             "size": size
         }
@@ -509,6 +798,9 @@ class MeshGenerator:
         json_path = os.path.join(save_dir, "meshinfo.json")
         json.dump(data, open(json_path, "w"))
 
+        if self.export_packing:
+            self.save_packing(os.path.join(save_dir, f"packing{n}.npz"))
+
         if visualize:
             try:
                 gmsh.fltk.run()
@@ -517,8 +809,82 @@ class MeshGenerator:
 
         gmsh.finalize()
 
+    def generate_from_packing(self, packing_path, visualize, save_path):
+        self.load_packing(packing_path)
+        self.generate(visualize, save_path)
+
+    def generate_tiled(self, visualize, save_path):
+        comm = self.comm
+        if not self.packed:
+            self.pack(self.pack_from_af if self.use_ratio else self.pack_from_circles)
+
+        nodes_per_cell = 3 if self.geometry_order == 1 else 6
+        if comm.rank == 0:
+            x, cells, cell_values = tiling.mesh_tiles(
+                self.placed_circles, self.layout_x, self.layout_y, self.tiles,
+                self.mesh_element_size, self.geometry_order, self.tile_workers,
+                self.mesh_options(default_algorithm=None if self.use_ratio else 6)
+            )
+            console.log(f"[green]Stitched {self.tiles[0]}x{self.tiles[1]} tiles into {len(cells)} cells, {len(x)} nodes[/green]")
+        else:
+            x = np.zeros((0, 2))
+            cells = np.zeros((0, nodes_per_cell), dtype=np.int64)
+            cell_values = np.zeros(0, dtype=np.int32)
+
+        # Same steps as gmshio.model_to_mesh, starting from the stitched arrays
+        domain = gmshio.ufl_mesh(2 if nodes_per_cell == 3 else 9, 2, dtype=default_real_type)
+        cells = cells[:, gmshio.cell_perm_array(CellType.triangle, nodes_per_cell)].copy()
+        mesh = create_mesh(comm, cells, x.astype(default_real_type, copy=False), domain)
+
+        local_entities, local_values = distribute_entity_data(mesh, mesh.topology.dim, cells, cell_values)
+        mesh.topology.create_connectivity(mesh.topology.dim, 0)
+        cell_tags = meshtags_from_entities(mesh, mesh.topology.dim, adjacencylist(local_entities),
+                                           local_values.astype(np.int32, copy=False))
+
+        # Facet tags by position, matching the Bottom/Right/Top/Left physical groups
+        fdim = mesh.topology.dim - 1
+        mesh.topology.create_entities(fdim)
+        mesh.topology.create_connectivity(fdim, mesh.topology.dim)
+        tol = 1e-8 * max(self.layout_x, self.layout_y)
+        sides = [
+            (1, lambda p: np.abs(p[1]) < tol),
+            (2, lambda p: np.abs(p[0] - self.layout_x) < tol),
+            (3, lambda p: np.abs(p[1] - self.layout_y) < tol),
+            (4, lambda p: np.abs(p[0]) < tol),
+        ]
+        facets = [(locate_entities_boundary(mesh, fdim, marker), tag) for tag, marker in sides]
+        indices = np.concatenate([f for f, _ in facets]).astype(np.int32)
+        values = np.concatenate([np.full(len(f), tag, dtype=np.int32) for f, tag in facets])
+        order = np.argsort(indices)
+        facet_tags = meshtags(mesh, fdim, indices[order], values[order])
+
+        cell_tags.name = "cell_tags"
+        facet_tags.name = "facet_tags"
+
+        with XDMFFile(comm, save_path, "w") as xdmf:
+            xdmf.write_mesh(mesh)
+            xdmf.write_meshtags(cell_tags, mesh.geometry)
+            xdmf.write_meshtags(facet_tags, mesh.geometry)
+
+        match = re.search(r'mesh(\d+)\.xdmf$', str(save_path))
+        n = int(match.group(1)) if match else 0
+        data = {
+            "id": n,
+            "circles": self.placed_count,
+            "area_fraction": (self.circle_area_sum / self.square_area_sum) * 100,
+            "size": self.layout_x * self.layout_y
+        }
+
+        save_dir = os.path.dirname(save_path)
+        json.dump(data, open(os.path.join(save_dir, "meshinfo.json"), "w"))
+
+        if self.export_packing:
+            self.save_packing(os.path.join(save_dir, f"packing{n}.npz"))
+
     def generate(self, visualize, save_path):
-        if self.use_ratio:
+        if self.tiles is not None and self.tiles[0] * self.tiles[1] > 1:
+            self.generate_tiled(visualize, save_path)
+        elif self.use_ratio:
             self.generate_from_af(visualize, save_path)
         else:
             self.generate_from_circles(visualize, save_path)
\ No newline at end of file
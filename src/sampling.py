@@ -0,0 +1,65 @@
+import itertools
+import math
+import numpy as np
+
+# Space-filling designs for the per-cycle parameters. Each cycle gets one point of a
+# Latin hypercube (every axis split into `cycles` strata, one point per stratum) or of a
+# stratified grid (k strata per axis, cells visited in shuffled order). Points are mapped
+# onto sweep axes, so a design point is a regular sweep job plus a seed for the packing.
+
+def latin_hypercube(n, dims, rng):
+    strata = np.column_stack([rng.permutation(n) for _ in range(dims)])
+    return (strata + rng.random((n, dims))) / n
+
+def stratified(n, dims, rng):
+    k = max(1, int(math.floor(n ** (1.0 / dims) + 1e-9)))
+    cells = np.array(list(itertools.product(range(k), repeat=dims)))
+    rounds = math.ceil(n / len(cells))
+    order = np.concatenate([rng.permutation(len(cells)) for _ in range(rounds)])[:n]
+    return (cells[order] + rng.random((n, dims))) / k
+
+def design_axes(ranges):
+    # (axis, component, kind, values) per design dimension. layout takes one [lo, hi]
+    # range per side, lists of strings are categorical, circles is rounded to an integer.
+    dims = []
+    for axis, values in ranges.items():
+        if axis == "layout":
+            for component, bounds in enumerate(values):
+                dims.append((axis, component, "range", bounds))
+        elif all(isinstance(v, str) for v in values):
+            dims.append((axis, None, "choice", values))
+        else:
+            dims.append((axis, None, "integer" if axis == "circles" else "range", values))
+    return dims
+
+def design_jobs(sampling_params, n):
+    method = sampling_params.get("method", "lhs")
+    rng = np.random.default_rng(sampling_params.get("seed"))
+    dims = design_axes(sampling_params["ranges"])
+
+    if method == "lhs":
+        unit = latin_hypercube(n, len(dims), rng)
+    elif method == "stratified":
+        unit = stratified(n, len(dims), rng)
+    else:
+        raise ValueError("Unsupported sampling method.")
+    seeds = rng.integers(0, 2**31 - 1, size=n)
+
+    jobs = []
+    for point, seed in zip(unit, seeds):
+        job = {"seed": int(seed)}
+        for u, (axis, component, kind, values) in zip(point, dims):
+            if kind == "choice":
+                value = values[min(int(u * len(values)), len(values) - 1)]
+            else:
+                value = values[0] + u * (values[1] - values[0])
+                if kind == "integer":
+                    value = int(round(value))
+                else:
+                    value = float(value)
+            if component is None:
+                job[axis] = value
+            else:
+                job.setdefault(axis, [0.0] * len(sampling_params["ranges"][axis]))[component] = value
+        jobs.append(job)
+    return jobs
@@ -0,0 +1,142 @@
+from scipy.stats import t as student_t
+import math
+
+# Streaming statistics for a study. Rows arrive one cycle at a time, so nothing here keeps
+# the full history: mean/variance use Welford's update and quantiles use the P^2 estimator
+# (Jain & Chlamtac), which keeps five markers per quantile.
+
+class OnlineStats:
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, x):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+        self.min = min(self.min, x)
+        self.max = max(self.max, x)
+
+    def variance(self):
+        if self.n < 2:
+            return 0.0
+        return self.m2 / (self.n - 1)
+
+    def std(self):
+        return math.sqrt(self.variance())
+
+    def ci_halfwidth(self, confidence=0.95):
+        if self.n < 2:
+            return math.inf
+        tval = student_t.ppf(0.5 + confidence / 2.0, self.n - 1)
+        return tval * self.std() / math.sqrt(self.n)
+
+
+class P2Quantile:
+    def __init__(self, p):
+        self.p = p
+        self.heights = []
+        self.positions = [1, 2, 3, 4, 5]
+        self.desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self.increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def update(self, x):
+        q = self.heights
+        if len(q) < 5:
+            q.append(x)
+            q.sort()
+            return
+
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+
+        for i in range(k + 1, 5):
+            self.positions[i] += 1
+        for i in range(5):
+            self.desired[i] += self.increments[i]
+
+        for i in range(1, 4):
+            d = self.desired[i] - self.positions[i]
+            if (d >= 1 and self.positions[i + 1] - self.positions[i] > 1) or \
+               (d <= -1 and self.positions[i - 1] - self.positions[i] < -1):
+                step = 1 if d > 0 else -1
+                candidate = self.parabolic(i, step)
+                if not q[i - 1] < candidate < q[i + 1]:
+                    candidate = self.linear(i, step)
+                q[i] = candidate
+                self.positions[i] += step
+
+    def parabolic(self, i, d):
+        q, n = self.heights, self.positions
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+            (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def linear(self, i, d):
+        q, n = self.heights, self.positions
+        return q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+
+    def value(self):
+        q = self.heights
+        if not q:
+            return math.nan
+        if len(q) < 5:
+            return q[min(len(q) - 1, int(round(self.p * (len(q) - 1))))]
+        return q[2]
+
+
+class StudyMonitor:
+    def __init__(self, fields=("vms_max", "vms_mean"), quantiles=(0.5, 0.95),
+                 confidence=0.95, ci_width_percentage=5.0, min_cycles=10):
+        self.fields = list(fields)
+        self.confidence = confidence
+        self.ci_width_percentage = ci_width_percentage
+        self.min_cycles = min_cycles
+        self.moments = {f: OnlineStats() for f in self.fields}
+        self.quantiles = {f: [P2Quantile(p) for p in quantiles] for f in self.fields}
+
+    def update(self, row):
+        for f in self.fields:
+            x = float(row[f])
+            self.moments[f].update(x)
+            for est in self.quantiles[f]:
+                est.update(x)
+
+    def relative_ci_width(self, field):
+        stats = self.moments[field]
+        if stats.n < 2 or stats.mean == 0:
+            return math.inf
+        return 100.0 * 2.0 * stats.ci_halfwidth(self.confidence) / abs(stats.mean)
+
+    def converged(self):
+        if any(self.moments[f].n < self.min_cycles for f in self.fields):
+            return False
+        return all(self.relative_ci_width(f) <= self.ci_width_percentage for f in self.fields)
+
+    def summary(self):
+        data = {}
+        for f in self.fields:
+            stats = self.moments[f]
+            data[f] = {
+                "n": stats.n,
+                "mean": stats.mean,
+                "std": stats.std(),
+                "min": stats.min,
+                "max": stats.max,
+                "ci_width_percentage": self.relative_ci_width(f),
+                "quantiles": {str(est.p): est.value() for est in self.quantiles[f]}
+            }
+        return data
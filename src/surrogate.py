@@ -0,0 +1,90 @@
+from scipy.optimize import minimize
+from scipy.linalg import cho_factor, cho_solve
+import numpy as np
+import csv
+
+# Gaussian process regression on accumulated study results. Inputs and outputs are
+# normalized, the kernel is a squared exponential with one length scale per input, and
+# hyperparameters come from maximizing the log marginal likelihood.
+
+class GaussianProcess:
+    def __init__(self, restarts=3, seed=None):
+        self.restarts = restarts
+        self.rng = np.random.default_rng(seed)
+
+    def kernel(self, A, B, length_scales, signal_var):
+        d = (A[:, None, :] - B[None, :, :]) / length_scales
+        return signal_var * np.exp(-0.5 * np.sum(d * d, axis=-1))
+
+    def neg_log_likelihood(self, log_params):
+        dims = self.X.shape[1]
+        length_scales = np.exp(log_params[:dims])
+        signal_var = np.exp(log_params[dims])
+        noise_var = np.exp(log_params[dims + 1])
+        K = self.kernel(self.X, self.X, length_scales, signal_var) + (noise_var + 1e-10) * np.eye(len(self.X))
+        try:
+            factor = cho_factor(K, lower=True)
+        except np.linalg.LinAlgError:
+            return 1e25
+        alpha = cho_solve(factor, self.y)
+        return 0.5 * self.y @ alpha + np.sum(np.log(np.diag(factor[0]))) + 0.5 * len(self.X) * np.log(2 * np.pi)
+
+    def fit(self, X, y):
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        y = np.asarray(y, dtype=float)
+        self.x_mean, self.x_std = X.mean(axis=0), X.std(axis=0)
+        self.x_std[self.x_std == 0] = 1.0
+        self.y_mean, self.y_std = y.mean(), y.std() if y.std() > 0 else 1.0
+        self.X = (X - self.x_mean) / self.x_std
+        self.y = (y - self.y_mean) / self.y_std
+
+        dims = self.X.shape[1]
+        bounds = [(-3.0, 3.0)] * dims + [(-3.0, 3.0), (-12.0, 1.0)]
+        best = None
+        for r in range(self.restarts):
+            start = np.zeros(dims + 2) if r == 0 else self.rng.uniform([b[0] for b in bounds], [b[1] for b in bounds])
+            if r == 0:
+                start[-1] = -4.0
+            res = minimize(self.neg_log_likelihood, start, method="L-BFGS-B", bounds=bounds)
+            if best is None or res.fun < best.fun:
+                best = res
+
+        self.length_scales = np.exp(best.x[:dims])
+        self.signal_var = np.exp(best.x[dims])
+        self.noise_var = np.exp(best.x[dims + 1])
+        K = self.kernel(self.X, self.X, self.length_scales, self.signal_var) + (self.noise_var + 1e-10) * np.eye(len(self.X))
+        self.factor = cho_factor(K, lower=True)
+        self.alpha = cho_solve(self.factor, self.y)
+        return self
+
+    def predict(self, X):
+        X = (np.atleast_2d(np.asarray(X, dtype=float)) - self.x_mean) / self.x_std
+        Ks = self.kernel(X, self.X, self.length_scales, self.signal_var)
+        mean = Ks @ self.alpha
+        v = cho_solve(self.factor, Ks.T)
+        var = np.maximum(self.signal_var - np.sum(Ks * v.T, axis=1), 0.0)
+        return mean * self.y_std + self.y_mean, np.sqrt(var) * self.y_std
+
+
+def load_results(results_file, features, target):
+    X, y = [], []
+    with open(results_file, mode='r') as file:
+        reader = csv.DictReader(file)
+        for row in reader:
+            try:
+                X.append([float(row[f]) for f in features])
+                y.append(float(row[target]))
+            except (ValueError, KeyError):
+                continue
+    return np.array(X), np.array(y)
+
+def candidate_points(bounds, count, rng):
+    names = list(bounds.keys())
+    low = np.array([bounds[n][0] for n in names], dtype=float)
+    high = np.array([bounds[n][1] for n in names], dtype=float)
+    return names, rng.uniform(low, high, size=(count, len(names)))
+
+def most_uncertain(model, candidates):
+    mean, std = model.predict(candidates)
+    best = int(np.argmax(std))
+    return candidates[best], mean[best], std[best]
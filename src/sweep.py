@@ -0,0 +1,99 @@
+import itertools
+import copy
+import json
+import math
+import meanfield
+
+# Sweep axes and how each one maps onto the regular config fields. A job is a plain dict
+# of axis values; apply_overrides turns it into a full per-cycle config.
+AXES = ["area_fraction", "circles", "distribution", "randomized_max_radius",
+        "layout", "mesh_element_size", "seed"]
+
+def apply_overrides(fields, job):
+    cycle_fields = copy.deepcopy(fields)
+    cycle_fields["ramp_circles"] = False
+    cycle_fields["ramp_layout"] = False
+    cycle_fields["ramp_af"] = False
+    for axis, value in job.items():
+        if axis == "area_fraction":
+            cycle_fields["control_af"] = True
+            cycle_fields["af_options"]["const_percentage"] = value
+        elif axis == "circles":
+            cycle_fields["control_af"] = False
+            cycle_fields["control_circles_params"]["circles"] = value
+        elif axis == "randomized_max_radius":
+            cycle_fields["random_params"]["randomized_max_radius"] = value
+        elif axis == "layout":
+            cycle_fields["layout"] = list(value)
+        elif axis in ("distribution", "mesh_element_size", "seed"):
+            cycle_fields[axis] = value
+        elif axis != "replicate":
+            raise ValueError(f"Unsupported sweep axis: {axis}")
+    return cycle_fields
+
+def expand_grid(sweep_params):
+    mode = sweep_params.get("mode", "cartesian")
+    if mode == "cartesian":
+        axes = sweep_params["axes"]
+        names = list(axes.keys())
+        points = [dict(zip(names, values)) for values in itertools.product(*[axes[n] for n in names])]
+    elif mode == "explicit":
+        points = [dict(p) for p in sweep_params["points"]]
+    else:
+        raise ValueError("Unsupported sweep mode.")
+
+    for point in points:
+        for axis in point:
+            if axis not in AXES:
+                raise ValueError(f"Unsupported sweep axis: {axis}")
+    return points
+
+# Densest packing of equal disks, placement rejections blow up on the way there
+PACKING_LIMIT = math.pi / (2 * math.sqrt(3))
+
+def estimate_cost(fields, job):
+    # Element count scales with domain area over element area. On top of that the refinement
+    # along the interfaces grows with the fill fraction, and so do the rejected placements,
+    # so dense points are started first.
+    cycle_fields = apply_overrides(fields, job)
+    layout_x, layout_y = cycle_fields["layout"]
+    area = float(layout_x) * float(layout_y)
+    h = cycle_fields["mesh_element_size"]
+    if cycle_fields["control_af"]:
+        fill = cycle_fields["af_options"]["const_percentage"] / 100.0
+    else:
+        fill = cycle_fields["control_circles_params"]["circles"] * math.pi * meanfield.mean_square_radius(cycle_fields) / area
+    fill = min(max(fill, 0.0), 0.95 * PACKING_LIMIT)
+    return area / (h * h) * (1.0 + fill) / (1.0 - fill / PACKING_LIMIT)
+
+def normalize_value(axis, value):
+    # 20 and 20.0 are the same grid point; circles and seed stay integers
+    if isinstance(value, bool) or isinstance(value, str):
+        return value
+    if isinstance(value, (list, tuple)):
+        return [normalize_value(axis, v) for v in value]
+    if axis in ("circles", "seed"):
+        return int(value)
+    return float(value)
+
+def expand_jobs(fields, sweep_params):
+    replicates = sweep_params.get("replicates", 1)
+    seen = set()
+    jobs = []
+    for point in expand_grid(sweep_params):
+        key = json.dumps({axis: normalize_value(axis, value) for axis, value in point.items()}, sort_keys=True)
+        if key in seen:
+            continue
+        seen.add(key)
+        for r in range(replicates):
+            job = dict(point)
+            job["replicate"] = r
+            if "seed" in point:
+                # A fixed seed would make every replicate the same packing, and seed + r would
+                # reuse the seeds of the neighbouring points
+                job["seed"] = int(point["seed"]) * replicates + r
+            jobs.append(job)
+
+    # Longest jobs first so that the pool does not finish on one big straggler
+    jobs.sort(key=lambda job: estimate_cost(fields, job), reverse=True)
+    return jobs
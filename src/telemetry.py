@@ -0,0 +1,93 @@
+import json
+import time
+import os
+
+# Progress stream for long studies. Every finished cycle appends one JSON line to
+# results/telemetry.jsonl with its stage durations and the running totals of the study
+# (throughput, failure rate, worker utilization, ETA), so a run can be checked from another
+# shell with `make status` without attaching to its terminal.
+
+class Telemetry:
+    def __init__(self, path, total=None, workers=1, mode="serial"):
+        self.path = path
+        self.total = total
+        self.workers = max(int(workers), 1)
+        self.mode = mode
+        self.start = time.time()
+        self.completed = 0
+        self.failed = 0
+        self.busy = 0.0
+        self.stage_totals = {}
+        open(path, "w").close()
+
+    def record(self, cycle_id, timings, ok=True, queued=0, running=0, rank=0):
+        self.completed += 1
+        if not ok:
+            self.failed += 1
+        for stage, seconds in timings.items():
+            self.stage_totals[stage] = self.stage_totals.get(stage, 0.0) + seconds
+        self.busy += sum(timings.values())
+
+        now = time.time()
+        elapsed = now - self.start
+        rate = self.completed / elapsed if elapsed > 0 else 0.0
+        remaining = None if self.total is None else max(self.total - self.completed, 0)
+        entry = {
+            "time": now,
+            "mode": self.mode,
+            "id": cycle_id,
+            "rank": rank,
+            "status": "ok" if ok else "failed",
+            "stages": timings,
+            "completed": self.completed,
+            "failed": self.failed,
+            "total": self.total,
+            "queued": queued,
+            "running": running,
+            "workers": self.workers,
+            "elapsed": elapsed,
+            "cycles_per_hour": 3600.0 * rate,
+            "failure_rate": self.failed / self.completed,
+            "utilization": min(self.busy / (elapsed * self.workers), 1.0) if elapsed > 0 else 0.0,
+            "stage_means": {stage: total / self.completed for stage, total in self.stage_totals.items()},
+            "eta_seconds": remaining / rate if remaining is not None and rate > 0 else None,
+        }
+        with open(self.path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+        return entry
+
+def read_entries(path):
+    entries = []
+    if not os.path.exists(path):
+        return entries
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                # The last line can be half written while the study is running
+                continue
+    return entries
+
+def format_duration(seconds):
+    if seconds is None:
+        return "unknown"
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}h {minutes:02d}m {seconds:02d}s"
+
+def summarize(path, recent=20):
+    entries = read_entries(path)
+    if not entries:
+        return None
+    last = entries[-1]
+    window = entries[-recent:]
+    summary = dict(last)
+    # Throughput over the last few cycles shows slowdowns the study-wide average hides
+    if len(window) > 1 and window[-1]["time"] > window[0]["time"]:
+        summary["recent_cycles_per_hour"] = 3600.0 * (len(window) - 1) / (window[-1]["time"] - window[0]["time"])
+    else:
+        summary["recent_cycles_per_hour"] = last["cycles_per_hour"]
+    summary["since_update"] = time.time() - last["time"]
+    return summary
@@ -0,0 +1,90 @@
+from concurrent.futures import ProcessPoolExecutor
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree
+from geometry import build_direct_geometry
+import multiprocessing
+import numpy as np
+import gmsh
+
+# Tiled meshing of large layouts. The packed domain is cut into a grid of rectangles, every
+# tile is built with the boolean-free geometry builder and meshed in its own process, and the
+# tiles are glued back together by merging coincident nodes. Tile edges get a uniform,
+# length-based node spacing between the same breakpoints (tile corners and circle crossings)
+# on both sides, so the stitched mesh is conforming.
+
+def tile_bounds(layout_x, layout_y, tiles):
+    xs = np.linspace(0.0, layout_x, tiles[0] + 1)
+    ys = np.linspace(0.0, layout_y, tiles[1] + 1)
+    return [(float(xs[i]), float(ys[j]), float(xs[i + 1]), float(ys[j + 1]))
+            for j in range(tiles[1]) for i in range(tiles[0])]
+
+def tile_circles(circles, bounds):
+    if len(circles) == 0:
+        return []
+    circles = np.asarray(circles, dtype=float)
+    cx, cy, r = circles[:, 0], circles[:, 1], circles[:, 2]
+    x0, y0, x1, y1 = bounds
+    # Distance from the centre to the tile rectangle decides whether a circle reaches into it
+    dx = np.maximum.reduce([x0 - cx, np.zeros_like(cx), cx - x1])
+    dy = np.maximum.reduce([y0 - cy, np.zeros_like(cy), cy - y1])
+    return [tuple(float(v) for v in c) for c in circles[np.hypot(dx, dy) < r]]
+
+def mesh_tile(job):
+    bounds, circles, mesh_element_size, element_order, options = job
+    gmsh.initialize()
+    gmsh.option.setNumber("General.Terminal", 0)
+    gmsh.model.add("Tile")
+    gmsh.option.setNumber("Mesh.CharacteristicLengthMax", mesh_element_size)
+    for name, value in options.items():
+        gmsh.option.setNumber(name, value)
+    if element_order > 1:
+        gmsh.option.setNumber("Mesh.ElementOrder", element_order)
+
+    groups = build_direct_geometry(circles, *bounds, mesh_element_size, boundary_size=mesh_element_size)
+    if groups is None:
+        gmsh.finalize()
+        return None
+    gmsh.model.mesh.generate(2)
+
+    node_tags, coords, _ = gmsh.model.mesh.getNodes()
+    order = np.argsort(node_tags)
+    x = coords.reshape(-1, 3)[order, :2]
+    sorted_tags = node_tags[order]
+
+    cells, values = [], []
+    for value, surfaces in ((1, groups["circles"]), (2, groups["background"])):
+        for surface in surfaces:
+            types, _, element_nodes = gmsh.model.mesh.getElements(2, surface)
+            for element_type, nodes in zip(types, element_nodes):
+                nodes_per_cell = gmsh.model.mesh.getElementProperties(element_type)[3]
+                conn = np.searchsorted(sorted_tags, nodes).reshape(-1, nodes_per_cell)
+                cells.append(conn)
+                values.append(np.full(len(conn), value, dtype=np.int32))
+    gmsh.finalize()
+    return x, np.vstack(cells), np.concatenate(values)
+
+def stitch(pieces, tol):
+    offsets = np.cumsum([0] + [len(x) for x, _, _ in pieces])
+    x = np.vstack([x for x, _, _ in pieces])
+    cells = np.vstack([conn + offset for (_, conn, _), offset in zip(pieces, offsets)])
+    values = np.concatenate([v for _, _, v in pieces])
+
+    # Nodes on shared tile edges appear once per tile, collapse each group to one node
+    pairs = cKDTree(x).query_pairs(tol, output_type="ndarray")
+    graph = coo_matrix((np.ones(len(pairs)), (pairs[:, 0], pairs[:, 1])), shape=(len(x), len(x)))
+    count, labels = connected_components(graph, directed=False)
+    merged = np.zeros((count, 2))
+    merged[labels] = x
+    return merged, labels[cells].astype(np.int64), values
+
+def mesh_tiles(circles, layout_x, layout_y, tiles, mesh_element_size, element_order=1, workers=None, options=None):
+    jobs = [(bounds, tile_circles(circles, bounds), mesh_element_size, element_order, options or {})
+            for bounds in tile_bounds(layout_x, layout_y, tiles)]
+    # Spawned so the tile processes do not inherit the MPI state of the caller
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        pieces = list(pool.map(mesh_tile, jobs))
+    failed = [job[0] for job, piece in zip(jobs, pieces) if piece is None]
+    if failed:
+        raise RuntimeError(f"Tiles {failed} need boolean operations, use fewer tiles or move the cuts")
+    return stitch(pieces, 1e-6 * mesh_element_size)